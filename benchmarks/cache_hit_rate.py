@@ -0,0 +1,74 @@
+"""Доля попаданий в кэш при нескольких процессах-воркерах.
+
+Каждый воркер обслуживает поток запросов к «страницам» с распределением
+Ципфа: читает фрагмент из кэша, а при промахе «рендерит» и записывает
+его. С LocMemCache у каждого воркера свой холодный кэш, с общим
+бэкендом воркеры пользуются работой друг друга.
+
+    python -m benchmarks.cache_hit_rate --workers 4 --requests 5000
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+from multiprocessing import get_context
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'sqlite': 'yatube.cache_backends.SQLiteCache',
+}
+
+
+def zipf_keys(rng, pages, count):
+    weights = [1 / rank for rank in range(1, pages + 1)]
+    return rng.choices(range(pages), weights=weights, k=count)
+
+
+def worker(backend, location, seed, pages, requests):
+    from django.conf import settings
+    settings.configure(CACHES={'default': {
+        'BACKEND': BACKENDS[backend],
+        'LOCATION': location,
+        'OPTIONS': {'MAX_ENTRIES': pages * 2},
+    }})
+    from django.core.cache import cache
+
+    hits = 0
+    for page in zipf_keys(random.Random(seed), pages, requests):
+        key = f'page:{page}'
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            cache.set(key, 'x' * 2048, timeout=None)
+    return hits
+
+
+def run(backend, workers, pages, requests):
+    directory = tempfile.mkdtemp()
+    location = os.path.join(directory, 'cache.sqlite3')
+    try:
+        with get_context('spawn').Pool(workers) as pool:
+            hits = pool.starmap(worker, [
+                (backend, location, seed, pages, requests)
+                for seed in range(workers)
+            ])
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return sum(hits) / (workers * requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+    for backend in BACKENDS:
+        rate = run(backend, args.workers, args.pages, args.requests)
+        print(f'{backend:>8}: {rate:.1%} попаданий '
+              f'({args.workers} воркеров)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Детерминированный набор данных для замеров: пользователи, группы,
+посты, комментарии и подписки.
+
+Популярность авторов и постов распределена по степенному закону, как на
+живом сайте: немногие авторы пишут большую часть постов и собирают
+большую часть подписчиков, немногие посты — большую часть комментариев.
+Один и тот же ``seed`` даёт один и тот же набор. Django должен быть
+настроен до вызова ``generate``.
+"""
+import random
+from dataclasses import dataclass, field
+from io import StringIO
+
+
+@dataclass
+class Dataset:
+    users: list = field(default_factory=list)
+    groups: list = field(default_factory=list)
+    posts: list = field(default_factory=list)
+    follows: int = 0
+    comments: int = 0
+
+
+def power_law(rng, population, count, exponent=1.0):
+    """``count`` элементов ``population``: k-й по популярности выпадает
+    с весом 1 / k ** exponent."""
+    ranks = range(1, len(population) + 1)
+    weights = [1 / rank ** exponent for rank in ranks]
+    return rng.choices(population, weights=weights, k=count)
+
+
+def generate(users=500, groups=20, posts=5000, comments=20000,
+             follows_per_user=20, seed=0):
+    from django.core.management import call_command
+
+    from posts import timeline
+    from posts.models import Comment, Follow, Group, Post, User
+
+    rng = random.Random(seed)
+    data = Dataset()
+
+    User.objects.bulk_create(
+        User(username=f'user{i}', password='!') for i in range(users)
+    )
+    data.users = list(User.objects.order_by('pk'))
+
+    Group.objects.bulk_create(
+        Group(title=f'Группа {i}', slug=f'group-{i}',
+              description=f'Описание группы {i}')
+        for i in range(groups)
+    )
+    data.groups = list(Group.objects.order_by('pk'))
+
+    authors = power_law(rng, data.users, posts)
+    Post.objects.bulk_create(
+        Post(
+            text=f'Пост {i} автора {author.username}',
+            author=author,
+            group=rng.choice(data.groups) if rng.random() < 0.7 else None,
+        )
+        for i, author in enumerate(authors)
+    )
+    data.posts = list(
+        Post.objects.order_by('pk').values_list(
+            'pk', 'author__username', named=True
+        )
+    )
+
+    follows = set()
+    for user in data.users:
+        count = min(int(rng.paretovariate(1.5) * follows_per_user / 3),
+                    users - 1)
+        for author in power_law(rng, data.users, count):
+            if author != user:
+                follows.add((user.pk, author.pk))
+    Follow.objects.bulk_create(
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in sorted(follows)
+    )
+    data.follows = len(follows)
+
+    Comment.objects.bulk_create(
+        Comment(post_id=post.pk, author=rng.choice(data.users),
+                text=f'Комментарий {i}')
+        for i, post in enumerate(power_law(rng, data.posts, comments))
+    )
+    data.comments = comments
+
+    # bulk_create не вызывает сигналы: счётчики и ленты подписок
+    # заполняются так же, как их чинят на живой базе.
+    call_command('reconcile_counters', stdout=StringIO())
+    for follow in Follow.objects.select_related('user', 'author'):
+        timeline.backfill(follow.user, follow.author)
+    return data
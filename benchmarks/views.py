@@ -0,0 +1,211 @@
+"""Время ответа и число запросов к базе для основных страниц постов.
+
+Проект запускается без сети на временной базе SQLite с набором данных
+из ``benchmarks.data``. Каждый сценарий делает ``--requests`` запросов
+тестовым клиентом Django к страницам, выбранным со степенным
+распределением популярности, и печатает p50/p99 времени ответа и число
+запросов к базе на запрос. По умолчанию кэш выключен (DummyCache), чтобы
+замерялась отрисовка, а не попадания в кэш.
+
+    python -m benchmarks.views --requests 300
+    python -m benchmarks.views --json after.json --baseline before.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from .data import generate, power_law
+
+CACHES = {
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+}
+
+
+def configure(directory, cache):
+    """Настройки проекта с временной базой и кэшем ``cache``."""
+    import django
+    from django.conf import settings
+
+    from yatube import settings as project
+
+    values = {name: getattr(project, name)
+              for name in dir(project) if name.isupper()}
+    values.update(
+        SECRET_KEY='benchmark',
+        DEBUG=False,
+        DATABASES={'default': {
+            'ENGINE': 'yatube.db.sqlite3',
+            'NAME': os.path.join(directory, 'db.sqlite3'),
+        }},
+        CACHES={'default': {'BACKEND': CACHES[cache]}},
+        MEDIA_ROOT=os.path.join(directory, 'media'),
+        METRICS_SAMPLE_RATE=0,
+        # Самые популярные авторы набора читаются в ленте подписок
+        # напрямую, остальные — из разложенных лент.
+        TIMELINE_FANOUT_LIMIT=50,
+    )
+    settings.configure(**values)
+    django.setup()
+
+
+class Scenarios:
+    """Запросы сценариев: метод, адрес, данные формы и пользователь
+    (``None`` — аноним)."""
+
+    def __init__(self, data, rng):
+        self.data = data
+        self.rng = rng
+
+    def _user(self):
+        return self.rng.choice(self.data.users)
+
+    def _post(self):
+        return power_law(self.rng, self.data.posts, 1)[0]
+
+    def index(self):
+        return 'get', '/', None, None
+
+    def group_posts(self):
+        group = power_law(self.rng, self.data.groups, 1)[0]
+        return 'get', f'/group/{group.slug}/', None, None
+
+    def profile(self):
+        author = power_law(self.rng, self.data.users, 1)[0]
+        return 'get', f'/{author.username}/', None, None
+
+    def post_view(self):
+        post = self._post()
+        return 'get', f'/{post.author__username}/{post.pk}/', None, None
+
+    def follow_index(self):
+        return 'get', '/follow/', None, self._user()
+
+    def new_post(self):
+        return 'post', '/new/', {'text': 'Новый пост'}, self._user()
+
+    def add_comment(self):
+        post = self._post()
+        url = f'/{post.author__username}/{post.pk}/comment/'
+        return 'post', url, {'text': 'Новый комментарий'}, self._user()
+
+
+# Сначала чтения: записи меняют данные, которые читают сценарии.
+SCENARIOS = ('index', 'group_posts', 'profile', 'post_view',
+             'follow_index', 'new_post', 'add_comment')
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def run(name, data, requests, warmup, seed):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    scenarios = Scenarios(data, random.Random(f'{seed}:{name}'))
+    clients = {}
+    timings, queries = [], []
+    for i in range(warmup + requests):
+        method, url, form, user = getattr(scenarios, name)()
+        client = clients.get(user)
+        if client is None:
+            client = clients[user] = Client()
+            if user is not None:
+                client.force_login(user)
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = getattr(client, method)(url, form)
+            elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise RuntimeError(f'{name}: {url} → {response.status_code}')
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+            queries.append(len(captured))
+    return {
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        'queries': round(sum(queries) / len(queries), 2),
+        'max_queries': max(queries),
+    }
+
+
+def _delta(value, base):
+    if not base:
+        return ''
+    return f' ({(value - base) / base:+.0%})'
+
+
+def report(results, baseline):
+    print(f'{"сценарий":<14}{"p50, мс":>16}{"p99, мс":>16}'
+          f'{"запросов":>16}{"макс.":>8}')
+    for name, result in results.items():
+        base = baseline.get(name, {})
+        cells = [
+            f'{result[key]}{_delta(result[key], base.get(key))}'
+            for key in ('p50_ms', 'p99_ms', 'queries')
+        ]
+        print(f'{name:<14}{cells[0]:>16}{cells[1]:>16}{cells[2]:>16}'
+              f'{result["max_queries"]:>8}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f'по умолчанию все: {", ".join(SCENARIOS)}')
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--comments', type=int, default=20000)
+    parser.add_argument('--follows-per-user', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache', choices=CACHES, default='dummy')
+    parser.add_argument('--json', help='сохранить результаты в файл')
+    parser.add_argument('--baseline',
+                        help='файл --json прошлого запуска для сравнения')
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'неизвестные сценарии: {", ".join(sorted(unknown))}')
+    scenarios = args.scenarios or SCENARIOS
+
+    directory = tempfile.mkdtemp()
+    try:
+        configure(directory, args.cache)
+        from django.core.management import call_command
+
+        call_command('migrate', verbosity=0)
+        data = generate(
+            users=args.users, groups=args.groups, posts=args.posts,
+            comments=args.comments, follows_per_user=args.follows_per_user,
+            seed=args.seed,
+        )
+        print(f'{len(data.users)} пользователей, {len(data.posts)} постов, '
+              f'{data.comments} комментариев, {data.follows} подписок')
+        results = {
+            name: run(name, data, args.requests, args.warmup, args.seed)
+            for name in scenarios
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    report(results, baseline)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,126 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.exceptions import ValidationError
 
+from . import moderation, search
 from .models import Comment, Follow, Group, Post
+from .paginator import EstimatedCountPaginator
 
 
-class PostAdmin(admin.ModelAdmin):
-    list_display = ("pk", "text", "pub_date", "author")
-    search_fields = ("text",)
-    list_filter = ("pub_date",)
+class UsernameFilter(admin.SimpleListFilter):
+    """Фильтр по имени пользователя в поле ввода: список всех
+    пользователей в боковой панели на большой базе не загрузить."""
+
+    template = 'admin/input_filter.html'
+    field = None
+
+    def lookups(self, request, model_admin):
+        # Без вариантов Django не показывает фильтр вовсе.
+        return ((),)
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice['query_parts'] = (
+            (key, value)
+            for key, value in changelist.get_filters_params().items()
+            if key != self.parameter_name
+        )
+        yield all_choice
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(
+                **{f'{self.field}__username': self.value().strip()}
+            )
+        return queryset
+
+
+class AuthorFilter(UsernameFilter):
+    title = 'автору'
+    parameter_name = field = 'author'
+
+
+class UserFilter(UsernameFilter):
+    title = 'подписчику'
+    parameter_name = field = 'user'
+
+
+class ModerationActionForm(ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(), required=False, label='Группа',
+    )
+
+
+def moderation_action(function, description):
+    """Действие админки над всеми выбранными записями через пакетную
+    функцию из ``moderation``."""
+    def action(modeladmin, request, queryset):
+        done = function(queryset)
+        modeladmin.message_user(
+            request, f'{description}: {done}', messages.SUCCESS
+        )
+    action.short_description = description
+    action.__name__ = function.__name__
+    return action
+
+
+class ScaledAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Второй COUNT(*) по всей таблице ради «всего N» не нужен.
+    show_full_result_count = False
     empty_value_display = "-пусто-"
 
 
+class PostAdmin(ScaledAdmin):
+    list_display = ("pk", "text", "pub_date", "author", "group")
+    list_select_related = ("author", "group")
+    search_fields = ("text",)
+    list_filter = ("pub_date", AuthorFilter)
+    date_hierarchy = "pub_date"
+    autocomplete_fields = ("author", "group")
+    action_form = ModerationActionForm
+    actions = (
+        moderation_action(moderation.delete_posts, 'Удалить'),
+        moderation_action(moderation.hide_posts, 'Скрыть'),
+        moderation_action(moderation.show_posts, 'Показать'),
+        'move_to_group',
+        moderation_action(moderation.ungroup_posts, 'Убрать из группы'),
+    )
+
+    def get_actions(self, request):
+        # Стандартное удаление загружает и удаляет записи по одной.
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def move_to_group(self, request, queryset):
+        form = ModerationActionForm(request.POST)
+        try:
+            group = form.fields['group'].clean(request.POST.get('group'))
+        except ValidationError:
+            group = None
+        if group is None:
+            # Без группы посты ушли бы из своих групп: для этого есть
+            # отдельное действие.
+            self.message_user(
+                request, 'Выберите группу для переноса', messages.ERROR
+            )
+            return
+        done = moderation.move_posts(queryset, group)
+        self.message_user(
+            request, f'Перенесено в группу: {done}', messages.SUCCESS
+        )
+    move_to_group.short_description = 'Перенести в группу'
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту идёт через полнотекстовый индекс, а не LIKE;
+        # скрытые посты тоже находятся, чтобы их можно было вернуть.
+        if not search_term:
+            return queryset, False
+        return search.matching(queryset, search_term, with_hidden=True), False
+
+
 class GroupAdmin(admin.ModelAdmin):
     list_display = ("pk", "title", "slug", "description")
     search_fields = ("title",)
@@ -17,18 +128,31 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = "-пусто-"
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ScaledAdmin):
     list_display = ("pk", "author", "text", "created")
-    search_fields = ("author",)
-    list_filter = ("author",)
-    empty_value_display = "-пусто-"
+    list_select_related = ("author",)
+    search_fields = ("=author__username",)
+    list_filter = (AuthorFilter,)
+    date_hierarchy = "created"
+    autocomplete_fields = ("post", "author")
+    actions = (
+        moderation_action(moderation.delete_comments, 'Удалить'),
+        moderation_action(moderation.hide_comments, 'Скрыть'),
+        moderation_action(moderation.show_comments, 'Показать'),
+    )
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(ScaledAdmin):
     list_display = ("pk", "user", "author")
-    search_fields = ("user", "author",)
-    list_filter = ("user", "author",)
-    empty_value_display = "-пусто-"
+    list_select_related = ("user", "author")
+    search_fields = ("=user__username", "=author__username")
+    list_filter = (UserFilter, AuthorFilter)
+    autocomplete_fields = ("user", "author")
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,135 @@
+"""JSON API лент только для чтения.
+
+Ленты выбираются теми же запросами и тем же постраничным выводом по
+курсору, что и HTML-страницы. Ответы условные (см. ``http.versioned``):
+клиент, опрашивающий ленту, получает 304, пока она не изменилась.
+"""
+from functools import wraps
+
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_safe
+
+from yatube import settings
+
+from . import timeline, versions
+from .http import versioned
+from .models import Group, Post, User
+from .paginator import CursorPaginator
+from .views import comment_paginator, visible_comments
+
+
+def api_view(view):
+    """Ошибки API отдаются в JSON, а не HTML-страницей."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return _json({'detail': 'Не найдено.'}, status=404)
+    return wrapper
+
+
+def _json(data, **kwargs):
+    return JsonResponse(
+        data, json_dumps_params={'ensure_ascii': False}, **kwargs
+    )
+
+
+def post_data(request, post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'updated': post.updated.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': request.build_absolute_uri(post.image.url)
+        if post.image else None,
+        'comment_count': post.comment_count,
+        'url': request.build_absolute_uri(
+            reverse('post', args=[post.author.username, post.pk])
+        ),
+    }
+
+
+def _page_url(request, cursor):
+    if cursor is None:
+        return None
+    return request.build_absolute_uri(f'{request.path}?cursor={cursor}')
+
+
+def feed_response(request, queryset, ordering=('-pub_date', '-id')):
+    paginator = CursorPaginator(queryset, settings.POST_PER_PAGE, ordering)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return _json({
+        'results': [post_data(request, post) for post in page],
+        'next': _page_url(request, page.next_cursor),
+        'previous': _page_url(request, page.previous_cursor),
+    })
+
+
+@api_view
+@versioned(lambda request: [versions.FEED])
+def index(request):
+    return feed_response(request, Post.objects.feed())
+
+
+@api_view
+@versioned(lambda request, slug: [versions.group_scope(slug)])
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, group.posts.feed())
+
+
+@api_view
+@versioned(lambda request, username: [versions.author_scope(username)])
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, author.posts.feed())
+
+
+@api_view
+@versioned(lambda request, post_id: [versions.post_scope(post_id)])
+def post_view(request, post_id):
+    post = get_object_or_404(Post.objects.feed(), pk=post_id)
+    # Комментарии листаются тем же курсором, что и во фрагменте на
+    # странице поста: сначала новые.
+    paginator = comment_paginator(visible_comments(post))
+    page = paginator.get_page(request.GET.get('cursor'))
+    data = post_data(request, post)
+    data['comments'] = [
+        {
+            'id': comment.pk,
+            'author': comment.author.username,
+            'text': comment.text,
+            'created': comment.created.isoformat(),
+        }
+        for comment in page
+    ]
+    data['comments_next'] = _page_url(request, page.next_cursor)
+    data['comments_previous'] = _page_url(request, page.previous_cursor)
+    return _json(data)
+
+
+def _follow_scopes(request):
+    # Лента подписок меняется с любым новым постом и с подписками.
+    return [versions.FEED, versions.follow_scope(request.user.pk)]
+
+
+@api_view
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return _json({'detail': 'Нужна авторизация.'}, status=401)
+    return _follow_index(request)
+
+
+@versioned(_follow_scopes, per_user=True)
+def _follow_index(request):
+    return feed_response(
+        request,
+        timeline.follow_feed(request.user).feed(),
+        ordering=timeline.FEED_ORDERING,
+    )
@@ -0,0 +1,88 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Post, UserCounters
+
+# Счётчики постов и комментариев не учитывают скрытые модератором.
+VISIBLE_POSTS = Post.objects.filter(is_hidden=False)
+VISIBLE_COMMENTS = Comment.objects.filter(is_hidden=False)
+
+
+def count_subquery(queryset, field):
+    counted = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def actual_counts(user_id):
+    return {
+        'posts_count': VISIBLE_POSTS.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def recount(user_id):
+    """Пересчитывает счётчики пользователя по данным и сохраняет их."""
+    counts = actual_counts(user_id)
+    try:
+        with transaction.atomic():
+            counters, _ = UserCounters.objects.update_or_create(
+                user_id=user_id, defaults=counts,
+            )
+    except IntegrityError:
+        counters = UserCounters.objects.get(user_id=user_id)
+    return counters
+
+
+def for_user(user):
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        return recount(user.pk)
+
+
+def change(user_id, **deltas):
+    """Атомарно сдвигает счётчики пользователя. Если строки счётчиков
+    ещё нет, она создаётся пересчётом (изменение в нём уже учтено),
+    но только при увеличении: удаления случаются и при удалении самого
+    пользователя, а недостающая строка всё равно пересчитается при
+    чтении."""
+    updated = UserCounters.objects.filter(user_id=user_id).update(
+        **{
+            name: Greatest(F(name) + delta, 0)
+            for name, delta in deltas.items()
+        }
+    )
+    if not updated and any(delta > 0 for delta in deltas.values()):
+        recount(user_id)
+
+
+def change_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=Greatest(F('comment_count') + delta, 0)
+    )
+
+
+def refresh_comments(post_ids):
+    """Пересчитывает ``comment_count`` постов одним UPDATE."""
+    Post.objects.filter(pk__in=post_ids).update(
+        comment_count=count_subquery(VISIBLE_COMMENTS, 'post')
+    )
+
+
+def refresh_posts(user_ids):
+    """Пересчитывает ``posts_count`` пользователей одним UPDATE."""
+    UserCounters.objects.filter(user_id__in=user_ids).update(
+        posts_count=count_subquery(VISIBLE_POSTS, 'author')
+    )
+
+
+def refresh_follows(user_ids):
+    """Пересчитывает счётчики подписок пользователей одним UPDATE."""
+    UserCounters.objects.filter(user_id__in=user_ids).update(
+        followers_count=count_subquery(Follow.objects, 'author'),
+        following_count=count_subquery(Follow.objects, 'user'),
+    )
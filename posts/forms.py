@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import Textarea
 
+from . import uploads
 from .models import Comment, Post
 
 
@@ -9,6 +11,21 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('group', 'text', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.files, self.rejected = uploads.pop_rejected(self.files)
+
+    def clean_image(self):
+        if 'image' in self.rejected:
+            raise forms.ValidationError(self.rejected['image'])
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile):
+            return image
+        error = uploads.check_header(image.image)
+        if error:
+            raise forms.ValidationError(error)
+        return uploads.reencode(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
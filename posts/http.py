@@ -0,0 +1,171 @@
+"""Кэширование ответов по версиям данных.
+
+ETag и Last-Modified страницы берутся из версий ``versions`` тех лент,
+которые она показывает: проверка стоит одного обращения к кэшу и ни
+одного запроса к базе, а 304 отдаётся без вызова view. Те же версии
+служат ключом кэша целых страниц для анонимов: запись в ленту делает
+закэшированную страницу устаревшей.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+from . import versions
+
+
+def _validators(request, stamps, per_user):
+    parts = [request.get_full_path(), *map(repr, stamps)]
+    if per_user:
+        parts.append(str(request.user.pk))
+    etag = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    modified = datetime.fromtimestamp(max(stamps), tz=timezone.utc)
+    return etag, modified
+
+
+def _state(request, scopes, per_user, args, kwargs):
+    # etag_func и last_modified_func вызываются для одного запроса
+    # по очереди; версии читаются один раз.
+    state = getattr(request, '_version_state', None)
+    if state is None:
+        missing = {}
+        stamps = versions.get(
+            *scopes(request, *args, **kwargs), missing=missing
+        )
+        state = request._version_state = (
+            *_validators(request, stamps, per_user), missing
+        )
+    return state
+
+
+def versioned(scopes, per_user=False):
+    """Декоратор условного GET: ``scopes(request, *args, **kwargs)``
+    возвращает версии, от которых зависит ответ. ``per_user`` — ответ
+    разный для разных пользователей."""
+    def etag(request, *args, **kwargs):
+        return _state(request, scopes, per_user, args, kwargs)[0]
+
+    def last_modified(request, *args, **kwargs):
+        return _state(request, scopes, per_user, args, kwargs)[1]
+
+    def decorator(view):
+        @wraps(view)
+        def seeding(request, *args, **kwargs):
+            state = getattr(request, '_version_state', None)
+            if state is None:
+                return view(request, *args, **kwargs)
+            with versions.pending(state[2]):
+                response = view(request, *args, **kwargs)
+            # Версии заводятся, только если страница нашлась.
+            if response.status_code == 200:
+                versions.seed(state[2])
+            return response
+
+        conditional = condition(
+            etag_func=etag, last_modified_func=last_modified
+        )(seeding)
+        if not per_user:
+            return conditional
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+
+    return decorator
+
+
+def cache_for_visitors(view):
+    """Cache-Control для HTML-страниц: анонимный ответ общий и его можно
+    отдавать из кэша HTTP_CACHE_MAX_AGE секунд, ответ вошедшему —
+    личный и перепроверяется по ETag при каждом показе."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(
+                response, public=True, max_age=settings.HTTP_CACHE_MAX_AGE
+            )
+            if settings.PAGE_CACHE_STALE:
+                patch_cache_control(
+                    response,
+                    stale_while_revalidate=settings.PAGE_CACHE_STALE,
+                )
+        patch_vary_headers(response, ('Cookie',))
+        return response
+    return wrapper
+
+
+def _cacheable(request, response):
+    # Ответы с формами (CSRF-токеном) и cookie нельзя отдавать другим.
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def anonymous_page_cache(scopes):
+    """Кэш целых ответов для анонимов по пути и курсору страницы.
+
+    Ответ хранится вместе с версиями ``scopes`` на момент отрисовки и
+    отдаётся, пока они не изменились. Если PAGE_CACHE_STALE больше нуля,
+    устаревший ответ ещё столько секунд после записи отдаётся всем,
+    кроме одного запроса, который перерисовывает страницу.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            path = f'{request.path}?{request.GET.get("cursor", "")}'
+            key = f'page:{hashlib.md5(path.encode()).hexdigest()}'
+            stamps = versions.get(*scopes(request, *args, **kwargs))
+
+            entry = cache.get(key)
+            if entry is not None:
+                cached_stamps, response = entry
+                if cached_stamps == stamps:
+                    return response
+                stale = time.time() - max(stamps) < settings.PAGE_CACHE_STALE
+                if stale and not cache.add(
+                    f'{key}:lock', True, settings.PAGE_CACHE_STALE
+                ):
+                    # Валидаторы старой версии: иначе клиент перепроверял
+                    # бы устаревшую страницу по ETag новой и получал 304.
+                    etag, modified = _validators(request, cached_stamps, True)
+                    response['ETag'] = quote_etag(etag)
+                    response['Last-Modified'] = http_date(
+                        modified.timestamp()
+                    )
+                    return response
+
+            response = view(request, *args, **kwargs)
+            if _cacheable(request, response):
+                cache.set(key, (stamps, response), settings.PAGE_CACHE_TIMEOUT)
+            cache.delete(f'{key}:lock')
+            return response
+        return wrapper
+    return decorator
+
+
+def cached_page(scopes):
+    """Всё кэширование HTML-страницы ленты: Cache-Control, условный GET
+    и кэш целых ответов для анонимов."""
+    def decorator(view):
+        view = anonymous_page_cache(scopes)(view)
+        view = versioned(scopes, per_user=True)(view)
+        return cache_for_visitors(view)
+    return decorator
@@ -0,0 +1,57 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from posts import variants
+from posts.models import Post
+
+# Варианты лежат в той же папке, но удаляются вместе с исходником.
+VARIANT_RE = re.compile(r'\.\d+w\.[a-z]+$')
+
+
+class Command(BaseCommand):
+    help = ('Удаляет изображения постов, на которые не ссылается ни один '
+            'пост, вместе с их миниатюрами и вариантами')
+
+    def add_arguments(self, parser):
+        # Файл только что загруженного поста может ещё ждать фиксации
+        # транзакции, поэтому свежие файлы не трогаем.
+        parser.add_argument('--min-age', type=int, default=24,
+                            help='Минимальный возраст файла в часах')
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        field = Post._meta.get_field('image')
+        storage = field.storage
+        directory = field.upload_to.rstrip('/')
+        threshold = timezone.now() - timedelta(hours=options['min_age'])
+
+        _, files = storage.listdir(directory)
+        names = sorted(
+            f'{directory}/{file}' for file in files
+            if not VARIANT_RE.search(file)
+        )
+        deleted = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(names), batch_size):
+            batch = names[start:start + batch_size]
+            referenced = set(Post.objects.filter(
+                image__in=batch
+            ).values_list('image', flat=True))
+            for name in batch:
+                if name in referenced:
+                    continue
+                if storage.get_modified_time(name) > threshold:
+                    continue
+                deleted += 1
+                if options['dry_run']:
+                    self.stdout.write(name)
+                    continue
+                delete_with_thumbnails(ImageFile(name, storage))
+                variants.delete(name)
+        self.stdout.write(f'Удалено изображений: {deleted}')
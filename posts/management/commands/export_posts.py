@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии или подписки в JSON Lines '
+            'или CSV')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=transfer.SPECS)
+        parser.add_argument('--output', '-o',
+                            help='Файл, по умолчанию стандартный вывод')
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            help='По умолчанию по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        name, path = options['model'], options['output']
+        fmt = options['format'] or transfer.guess_format(path)
+        rows = transfer.export_rows(name, options['batch_size'])
+        columns = transfer.SPECS[name].columns
+        if path is None:
+            transfer.write(rows, self.stdout, fmt, columns)
+            return
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            transfer.write(rows, file, fmt, columns)
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def generate(name):
+    try:
+        return thumbnails.generate(name)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = ('Создаёт недостающие миниатюры и адаптивные варианты '
+            'изображений постов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).order_by().values_list('image', flat=True).distinct()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            created = sum(pool.map(generate, names.iterator()))
+        self.stdout.write(f'Обработано изображений: {created}')
@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты, комментарии или подписки из JSON Lines '
+            'или CSV; порядок: group, post, comment, follow')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=transfer.SPECS)
+        parser.add_argument('path', help='Файл или «-» для стандартного ввода')
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            help='По умолчанию по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--create-users', action='store_true',
+                            help='Заводить недостающих пользователей '
+                                 'без пароля')
+
+    def handle(self, *args, **options):
+        name, path = options['model'], options['path']
+        fmt = options['format'] or transfer.guess_format(path)
+
+        def progress(read_count, loaded):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Прочитано: {read_count}, '
+                                  f'загружено: {loaded}')
+
+        def load(file):
+            return transfer.import_rows(
+                name, transfer.read(file, fmt),
+                batch_size=options['batch_size'],
+                create_users=options['create_users'],
+                progress=progress,
+            )
+
+        if path == '-':
+            read_count, loaded = load(sys.stdin)
+        else:
+            with open(path, encoding='utf-8', newline='') as file:
+                read_count, loaded = load(file)
+        self.stdout.write(
+            f'Прочитано: {read_count}, загружено: {loaded}, '
+            f'пропущено: {read_count - loaded}'
+        )
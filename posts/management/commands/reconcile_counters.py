@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import VISIBLE_COMMENTS, VISIBLE_POSTS, count_subquery
+from posts.models import Follow, Post, User, UserCounters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с данными и чинит расхождения'
+    user_fields = ('posts_count', 'followers_count', 'following_count')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        fixed_posts = 0
+        posts = Post.objects.annotate(
+            actual=count_subquery(VISIBLE_COMMENTS, 'post'),
+        ).values_list('pk', 'comment_count', 'actual')
+        for pk, stored, actual in posts.iterator(chunk_size=batch_size):
+            if stored != actual:
+                Post.objects.filter(pk=pk).update(comment_count=actual)
+                fixed_posts += 1
+
+        fixed_users = 0
+        users = User.objects.annotate(
+            posts_count=count_subquery(VISIBLE_POSTS, 'author'),
+            followers_count=count_subquery(Follow.objects, 'author'),
+            following_count=count_subquery(Follow.objects, 'user'),
+        ).values_list(
+            'pk', 'posts_count', 'followers_count', 'following_count',
+            'counters__posts_count', 'counters__followers_count',
+            'counters__following_count',
+        )
+        for user_id, *values in users.iterator(chunk_size=batch_size):
+            actual, stored = values[:3], values[3:]
+            if actual != stored:
+                UserCounters.objects.update_or_create(
+                    user_id=user_id,
+                    defaults=dict(zip(self.user_fields, actual)),
+                )
+                fixed_users += 1
+
+        self.stdout.write(
+            f'Исправлено постов: {fixed_posts}, '
+            f'пользователей: {fixed_users}'
+        )
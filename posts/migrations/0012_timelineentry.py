@@ -0,0 +1,82 @@
+# Generated by Django 2.2.6 on 2026-10-18 17:19
+
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_timelines(apps, schema_editor):
+    # Как timeline.backfill: посты популярных авторов читаются при
+    # открытии ленты, остальным подписчикам достаются последние
+    # TIMELINE_BACKFILL_SIZE постов автора.
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    authors = Follow.objects.order_by().values('author_id').annotate(
+        followers=models.Count('id')
+    ).filter(
+        followers__lt=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('author_id', flat=True)
+
+    def entries():
+        for author_id in authors.iterator():
+            posts = Post.objects.filter(author_id=author_id).order_by(
+                '-pub_date'
+            ).values_list('id', 'pub_date')
+            posts = list(posts[:settings.TIMELINE_BACKFILL_SIZE])
+            followers = Follow.objects.filter(
+                author_id=author_id
+            ).values_list('user_id', flat=True)
+            for user_id in followers.iterator():
+                for post_id, pub_date in posts:
+                    yield TimelineEntry(
+                        user_id=user_id,
+                        post_id=post_id,
+                        author_id=author_id,
+                        pub_date=pub_date,
+                    )
+
+    entries = entries()
+    while True:
+        batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(
+            batch, batch_size=settings.TIMELINE_BATCH_SIZE
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_auto_20210330_1843'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date'], name='posts_timel_user_id_b48120_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'author'], name='posts_timel_user_id_b036fb_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timelineentry',
+            unique_together={('user', 'post')},
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
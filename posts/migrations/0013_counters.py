@@ -0,0 +1,48 @@
+# Generated by Django 2.2.6 on 2026-10-18 17:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    for post in Post.objects.annotate(total=Count('comments')).iterator():
+        Post.objects.filter(pk=post.pk).update(comment_count=post.total)
+    for user in User.objects.all().iterator():
+        UserCounters.objects.create(
+            user_id=user.pk,
+            posts_count=Post.objects.filter(author_id=user.pk).count(),
+            followers_count=Follow.objects.filter(author_id=user.pk).count(),
+            following_count=Follow.objects.filter(user_id=user.pk).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0012_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations
+
+from posts import stemmer
+
+BATCH_SIZE = 1000
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX posts_post_search ON posts_post '
+            "USING GIN (to_tsvector('russian', text))"
+        )
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE posts_post_search USING fts5(body)'
+        )
+        Post = apps.get_model('posts', 'Post')
+        posts = Post.objects.order_by('pk').values_list('pk', 'text')
+        last = 0
+        while True:
+            batch = list(posts.filter(pk__gt=last)[:BATCH_SIZE])
+            if not batch:
+                break
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    'INSERT INTO posts_post_search (rowid, body) '
+                    'VALUES (%s, %s)',
+                    [(pk, ' '.join(stemmer.stems(text)))
+                     for pk, text in batch],
+                )
+            last = batch[-1][0]
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX posts_post_search')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE posts_post_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -26,10 +28,23 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+
+    def feed(self):
+        """Видимые посты для лент: автор и группа выбираются одним
+        запросом вместе с постом."""
+        return self.filter(is_hidden=False).select_related('author', 'group')
+
+
 class Post(models.Model):
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id']),
+            models.Index(fields=['author', '-pub_date', '-id']),
+            models.Index(fields=['group', '-pub_date', '-id']),
+        ]
 
     text = models.TextField(
         verbose_name='Текст',
@@ -55,7 +70,24 @@ class Post(models.Model):
         verbose_name='Название группы',
         help_text='Выберите группу',
     )
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    updated = models.DateTimeField(
+        verbose_name='date updated',
+        auto_now=True,
+    )
+    image = models.ImageField(
+        upload_to='posts/',
+        storage=ContentAddressedStorage(),
+        blank=True,
+        null=True,
+    )
+    image_variants = models.TextField(blank=True, default='', editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    is_hidden = models.BooleanField(
+        verbose_name='Скрыт модератором',
+        default=False,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
@@ -63,6 +95,12 @@ class Post(models.Model):
 
 class Comment(models.Model):
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created']),
+            models.Index(fields=['created']),
+        ]
+
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -81,6 +119,10 @@ class Comment(models.Model):
         verbose_name='date published',
         auto_now_add=True,
     )
+    is_hidden = models.BooleanField(
+        verbose_name='Скрыт модератором',
+        default=False,
+    )
 
     def __str__(self):
         return self.text[:15]
@@ -90,6 +132,9 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ['user', 'author']
+        indexes = [
+            models.Index(fields=['author', 'user']),
+        ]
 
     user = models.ForeignKey(
         User,
@@ -106,3 +151,52 @@ class Follow(models.Model):
 
     def __str__(self):
         return f"{self.user} подписан на {self.author}"
+
+
+class UserCounters(models.Model):
+    """Денормализованные счётчики пользователя для страницы профиля."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Счётчики {self.user_id}"
+
+
+class TimelineEntry(models.Model):
+    """Запись в ленте подписок пользователя, раскладывается при
+    публикации поста (fan-out on write)."""
+
+    class Meta:
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post']),
+            models.Index(fields=['user', 'author']),
+        ]
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.post_id} в ленте {self.user_id}"
@@ -0,0 +1,141 @@
+"""Пакетная модерация постов и комментариев.
+
+Выбранные записи обрабатываются порциями по MODERATION_BATCH_SIZE
+первичных ключей: на порцию — несколько UPDATE/DELETE по списку ключей
+в своей транзакции, без загрузки объектов и сигналов на каждый. Поэтому
+чистка волны спама не держит блокировку базы всё время работы. То, что
+обычно делают сигналы (счётчики, поисковый индекс, версии кэша),
+выполняется здесь же одним запросом на порцию.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from . import counters, search, versions
+from .models import Comment, Post, TimelineEntry
+
+logger = logging.getLogger(__name__)
+
+
+def _batches(queryset):
+    """Первичные ключи ``queryset`` порциями по возрастанию."""
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        batch = ids if last is None else ids.filter(pk__gt=last)
+        batch = list(batch[:settings.MODERATION_BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def _run(queryset, handle, progress=None):
+    """Вызывает ``handle(ids)`` для каждой порции в своей транзакции и
+    возвращает число обработанных записей."""
+    done = 0
+    for ids in _batches(queryset):
+        with transaction.atomic():
+            handle(ids)
+        done += len(ids)
+        logger.info('%s: обработано %d', queryset.model.__name__, done)
+        if progress is not None:
+            progress(done)
+    return done
+
+
+def _post_info(ids):
+    """Версии кэша, которые затрагивают посты ``ids``, и их авторы."""
+    scopes, authors = {versions.FEED}, set()
+    posts = Post.objects.filter(pk__in=ids).order_by().values_list(
+        'pk', 'author_id', 'author__username', 'group__slug'
+    )
+    for pk, author_id, username, slug in posts:
+        authors.add(author_id)
+        scopes.update((versions.post_scope(pk),
+                       versions.author_scope(username)))
+        if slug:
+            scopes.add(versions.group_scope(slug))
+    return scopes, authors
+
+
+def delete_posts(queryset, progress=None):
+    def handle(ids):
+        scopes, authors = _post_info(ids)
+        # Каскад вручную: _raw_delete не собирает связанные записи.
+        Comment.objects.filter(post_id__in=ids)._raw_delete(queryset.db)
+        TimelineEntry.objects.filter(post_id__in=ids)._raw_delete(
+            queryset.db
+        )
+        Post.objects.filter(pk__in=ids)._raw_delete(queryset.db)
+        search.unindex(*ids)
+        counters.refresh_posts(authors)
+        transaction.on_commit(lambda: versions.touch(*scopes))
+
+    return _run(queryset, handle, progress)
+
+
+def hide_posts(queryset, hidden=True, progress=None):
+    def handle(ids):
+        Post.objects.filter(pk__in=ids).update(is_hidden=hidden)
+        if hidden:
+            search.unindex(*ids)
+        else:
+            search.index(*ids)
+        scopes, authors = _post_info(ids)
+        counters.refresh_posts(authors)
+        transaction.on_commit(lambda: versions.touch(*scopes))
+
+    return _run(queryset.filter(is_hidden=not hidden), handle, progress)
+
+
+def show_posts(queryset, progress=None):
+    return hide_posts(queryset, hidden=False, progress=progress)
+
+
+def move_posts(queryset, group, progress=None):
+    def handle(ids):
+        # Посты пропадают из старых групп и появляются в новой.
+        scopes, _ = _post_info(ids)
+        Post.objects.filter(pk__in=ids).update(group=group)
+        scopes |= _post_info(ids)[0]
+        transaction.on_commit(lambda: versions.touch(*scopes))
+
+    return _run(queryset, handle, progress)
+
+
+def ungroup_posts(queryset, progress=None):
+    return move_posts(queryset, None, progress=progress)
+
+
+def _comment_posts(ids):
+    return set(Comment.objects.filter(pk__in=ids).order_by().values_list(
+        'post_id', flat=True
+    ))
+
+
+def delete_comments(queryset, progress=None):
+    def handle(ids):
+        posts = _comment_posts(ids)
+        Comment.objects.filter(pk__in=ids)._raw_delete(queryset.db)
+        counters.refresh_comments(posts)
+        scopes, _ = _post_info(posts)
+        transaction.on_commit(lambda: versions.touch(*scopes))
+
+    return _run(queryset, handle, progress)
+
+
+def hide_comments(queryset, hidden=True, progress=None):
+    def handle(ids):
+        posts = _comment_posts(ids)
+        Comment.objects.filter(pk__in=ids).update(is_hidden=hidden)
+        counters.refresh_comments(posts)
+        scopes, _ = _post_info(posts)
+        transaction.on_commit(lambda: versions.touch(*scopes))
+
+    return _run(queryset.filter(is_hidden=not hidden), handle, progress)
+
+
+def show_comments(queryset, progress=None):
+    return hide_comments(queryset, hidden=False, progress=progress)
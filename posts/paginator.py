@@ -0,0 +1,216 @@
+import base64
+import json
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage(Sequence):
+    """Страница выбирается при первом обращении, поэтому страница,
+    отрисованная из кэша шаблонов, не стоит ни одного запроса."""
+
+    def __init__(self, paginator, cursor=None):
+        self.paginator = paginator
+        self.cursor = cursor
+
+    def __repr__(self):
+        return f'<CursorPage {self.cursor or "first"}>'
+
+    @cached_property
+    def _result(self):
+        return self.paginator.fetch(self.cursor)
+
+    @property
+    def object_list(self):
+        return self._result[0]
+
+    @property
+    def next_cursor(self):
+        return self._result[1]
+
+    @property
+    def previous_cursor(self):
+        return self._result[2]
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу сортировки вместо OFFSET.
+
+    Страница выбирается условием «строго после/до последней показанной
+    записи» по полям ``ordering``, поэтому не нужен ни ``COUNT(*)``,
+    ни пропуск строк: любая страница стоит столько же, сколько первая.
+    Последнее поле ``ordering`` должно быть уникальным.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def encode_cursor(self, direction, obj):
+        values = []
+        for name in self.fields:
+            value = getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat')
+                          else value)
+        raw = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def _field(self, name):
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.object_list.model._meta.get_field(name)
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded))
+            if (direction not in ('n', 'p') or not isinstance(values, list)
+                    or len(values) != len(self.fields)):
+                raise ValueError
+            values = [
+                self._field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+            # С None сравнение в _seek не построить.
+            if None in values:
+                raise ValueError
+        except (TypeError, ValueError, ValidationError) as e:
+            raise InvalidCursor(cursor) from e
+        return direction, values
+
+    def _seek(self, values, forward):
+        """Условие «запись стоит после ``values``» (или до при
+        ``forward=False``) в порядке ``ordering``.
+
+        Избыточная граница по первому полю даёт базе диапазон для
+        поиска по индексу вместо просмотра его с начала.
+        """
+        condition = Q()
+        for i, name in enumerate(self.ordering):
+            descending = name.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{f'{self.fields[i]}__{lookup}': values[i]})
+            for prev_name, prev_value in zip(self.fields[:i], values[:i]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        descending = self.ordering[0].startswith('-')
+        bound = 'lte' if descending == forward else 'gte'
+        return Q(**{f'{self.fields[0]}__{bound}': values[0]}) & condition
+
+    def _parse(self, cursor):
+        if cursor:
+            try:
+                return self.decode_cursor(cursor)
+            except InvalidCursor:
+                pass
+        return 'n', None
+
+    def page_queryset(self, cursor=None):
+        """Запрос, которым выбирается страница по курсору."""
+        direction, values = self._parse(cursor)
+        queryset = self.object_list
+        if values is None:
+            queryset = queryset.order_by(*self.ordering)
+        elif direction == 'n':
+            queryset = queryset.filter(
+                self._seek(values, forward=True)
+            ).order_by(*self.ordering)
+        else:
+            reverse = [
+                name[1:] if name.startswith('-') else f'-{name}'
+                for name in self.ordering
+            ]
+            queryset = queryset.filter(
+                self._seek(values, forward=False)
+            ).order_by(*reverse)
+        return queryset[:self.per_page + 1]
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу по курсору; битый курсор — первая
+        страница, как у ``Paginator.get_page``."""
+        return CursorPage(self, cursor)
+
+    def fetch(self, cursor=None):
+        direction, values = self._parse(cursor)
+        rows = list(self.page_queryset(cursor))
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'p' and values is not None:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor('n', rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor('p', rows[0])
+        return rows, next_cursor, previous_cursor
+
+
+def estimate_count(queryset):
+    """Примерное число строк таблицы ``queryset`` из статистики базы или
+    ``None``, если база её не даёт."""
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    pk = queryset.model._meta.pk.column
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [table],
+            )
+        elif connection.vendor == 'sqlite':
+            # Границы первичного ключа берутся из индекса за O(log n);
+            # удалённые строки делают оценку завышенной.
+            quote = connection.ops.quote_name
+            cursor.execute(
+                f'SELECT MAX({quote(pk)}) - MIN({quote(pk)}) + 1 '
+                f'FROM {quote(table)}'
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] and row[0] > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator для админки: число записей нефильтрованной большой
+    таблицы берётся из оценки вместо ``COUNT(*)`` по всей таблице."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset)
+            if estimate and estimate > settings.ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
@@ -0,0 +1,147 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite посты индексируются в таблице FTS5 ``posts_post_search``:
+текст хранится в виде основ слов (см. ``stemmer``), ранжирование — bm25.
+На PostgreSQL используется GIN-индекс по ``to_tsvector('russian', text)``
+со встроенным русским словарём. На прочих базах остаётся ``icontains``.
+"""
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.functional import cached_property
+
+from . import stemmer
+from .models import Post
+
+TABLE = 'posts_post_search'
+VECTOR = "to_tsvector('russian', posts_post.text)"
+TSQUERY = "plainto_tsquery('russian', %s)"
+
+
+def _fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def _match_query(query):
+    # Каждая основа — отдельная фраза в кавычках, чтобы символы запроса
+    # не разбирались как синтаксис FTS5; фразы объединяются через AND.
+    return ' '.join(f'"{word}"' for word in stemmer.stems(query))
+
+
+def _stems(text):
+    return ' '.join(stemmer.stems(text))
+
+
+def register_functions(connection):
+    """Функция ``stems`` для индексации запросом INSERT ... SELECT;
+    регистрируется при открытии каждого соединения SQLite."""
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('stems', 1, _stems)
+
+
+def index(*post_ids):
+    """Переиндексирует посты ``post_ids``: скрытые убираются из индекса.
+    Два запроса на любое число постов."""
+    if not _fts_enabled() or not post_ids:
+        return
+    unindex(*post_ids)
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, body) '
+            f'SELECT id, stems(text) FROM {Post._meta.db_table} '
+            f'WHERE NOT is_hidden AND id IN ({placeholders})',
+            list(post_ids),
+        )
+
+
+def unindex(*post_ids):
+    if not _fts_enabled() or not post_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid IN ({placeholders})',
+            list(post_ids),
+        )
+
+
+class FTSResults:
+    """Найденные посты в порядке релевантности для ``Paginator``:
+    срез выбирает из индекса только нужную страницу."""
+
+    ordered = True
+
+    def __init__(self, query, queryset):
+        self.match = _match_query(query)
+        self.queryset = queryset
+
+    @cached_property
+    def _count(self):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {TABLE} WHERE {TABLE} MATCH %s',
+                [self.match],
+            )
+            return cursor.fetchone()[0]
+
+    def count(self):
+        return self._count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not self.match:
+            return []
+        offset = index.start or 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s '
+                'ORDER BY rank LIMIT %s OFFSET %s',
+                [self.match, index.stop - offset, offset],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def matching(queryset, query, with_hidden=False):
+    """``queryset``, сужённый до постов под ``query``, без ранжирования —
+    для мест, где нужен обычный QuerySet, как в админке.
+
+    Скрытых постов нет в индексе SQLite, поэтому с ``with_hidden`` они
+    ищутся подстрокой — одинаково на всех базах."""
+    if _fts_enabled():
+        match = _match_query(query)
+        found = Q(id__in=RawSQL(
+            f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [match]
+        )) if match else Q(pk__in=[])
+    elif connection.vendor == 'postgresql':
+        found = Q(id__in=RawSQL(
+            f'SELECT id FROM {Post._meta.db_table} '
+            f'WHERE {VECTOR} @@ {TSQUERY}', [query]
+        ))
+    else:
+        found = Q(text__icontains=query)
+    if with_hidden:
+        found = (Q(is_hidden=False) & found
+                 | Q(is_hidden=True, text__icontains=query))
+    return queryset.filter(found)
+
+
+def search(query, queryset=None):
+    """Посты, подходящие под ``query``, от самых релевантных."""
+    if queryset is None:
+        queryset = Post.objects.feed()
+    if _fts_enabled():
+        return FTSResults(query, queryset)
+    if connection.vendor == 'postgresql':
+        return matching(queryset, query).annotate(
+            rank=RawSQL(f'ts_rank({VECTOR}, {TSQUERY})', [query]),
+        ).order_by('-rank', '-id')
+    return matching(queryset, query).order_by('-pub_date', '-id')
@@ -0,0 +1,189 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, search, thumbnails, timeline, versions
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user, instance.author)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    timeline.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    if not instance.is_hidden:
+        counters.change(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if not instance.is_hidden:
+        counters.change_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change(instance.author_id, followers_count=1)
+        counters.change(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.change(instance.author_id, followers_count=-1)
+    counters.change(instance.user_id, following_count=-1)
+
+
+@receiver(post_delete, sender=Follow)
+def refill_timelines(sender, instance, **kwargs):
+    # После пересчёта подписчиков: автор мог перестать быть популярным.
+    timeline.refill(instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_group_slug = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group__slug', flat=True).first()
+
+
+def _touch(*scopes):
+    # Версии меняются после фиксации: иначе читатель возьмёт новую
+    # версию, прочтёт ещё старые строки и закэширует их под ней.
+    transaction.on_commit(lambda: versions.touch(*scopes))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def touch_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        previous = getattr(instance, '_previous_group_slug', None)
+        _touch(*versions.post_scopes(instance, previous))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def touch_commented_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _touch(*versions.post_scopes(instance.post))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def touch_follow(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _touch(
+            versions.author_scope(instance.author.username),
+            versions.author_scope(instance.user.username),
+            versions.follow_scope(instance.user_id),
+        )
+
+
+@receiver(pre_save, sender=Group)
+def remember_slug(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+def touch_group(sender, instance, raw=False, **kwargs):
+    # Название группы есть в карточках её постов на всех лентах, в том
+    # числе в профилях и на страницах постов их авторов.
+    if raw:
+        return
+    slugs = {instance.slug, getattr(instance, '_previous_slug', None)}
+    posts = Post.objects.filter(group=instance).order_by()
+    authors = posts.values_list('author__username', flat=True).distinct()
+    # Ответ API поста зависит только от версии поста.
+    _touch(
+        versions.FEED,
+        *[versions.group_scope(slug) for slug in slugs if slug],
+        *[versions.author_scope(username) for username in authors],
+        *[versions.post_scope(pk) for pk in posts.values_list(
+            'pk', flat=True
+        )],
+    )
+
+
+# Вход пользователя сохраняет только last_login: на страницах его нет.
+LOGIN_FIELDS = frozenset({'last_login'})
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, raw=False, update_fields=None,
+                      **kwargs):
+    if instance.pk and not raw and update_fields != LOGIN_FIELDS:
+        instance._previous_username = User.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def touch_user(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    # Нового пользователя ещё нет ни на одной странице.
+    if created or raw or update_fields == LOGIN_FIELDS:
+        return
+    names = {instance.username, getattr(instance, '_previous_username', None)}
+    # Имя есть и в ответе API на его посты и посты с его комментариями.
+    posts = Post.objects.filter(
+        Q(author=instance) | Q(comments__author=instance)
+    ).order_by().values_list('pk', flat=True).distinct()
+    _touch(
+        versions.FEED,
+        *[versions.author_scope(name) for name in names if name],
+        *[versions.post_scope(pk) for pk in posts],
+    )
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnail(sender, instance, raw=False, **kwargs):
+    if instance.image and not raw:
+        thumbnails.schedule(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index(instance.pk)
+
+
+@receiver(connection_created)
+def register_search_functions(sender, connection, **kwargs):
+    search.register_functions(connection)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex(instance.pk)
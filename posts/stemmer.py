@@ -0,0 +1,106 @@
+"""Стеммер Snowball для русского языка.
+
+Переложение алгоритма https://snowballstem.org/algorithms/russian/
+без внешних зависимостей: слова постов и поисковых запросов приводятся
+к общей основе, чтобы «котики» находились по запросу «котик».
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (('в', 'вши', 'вшись'),
+                     ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+ADJECTIVE = ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой',
+             'ем', 'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их',
+             'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею')
+PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'),
+              ('ивш', 'ывш', 'ующ'))
+REFLEXIVE = ('ся', 'сь')
+VERB = (('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+         'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+        ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+         'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+         'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'))
+NOUN = ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+        'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+        'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+        'ья', 'я')
+DERIVATIONAL = ('ост', 'ость')
+SUPERLATIVE = ('ейш', 'ейше')
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _regions(word):
+    """Начала областей RV и R2 в терминах Snowball."""
+    rv = r1 = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _ending(word, start, endings, after_a=()):
+    """Самое длинное окончание из ``endings`` или ``after_a`` внутри
+    ``word[start:]``; окончаниям ``after_a`` должна предшествовать
+    «а» или «я». Как и в Snowball, более короткие не перебираются."""
+    found = ''
+    for ending in endings + after_a:
+        if (len(ending) > len(found) and word.endswith(ending)
+                and len(word) - len(ending) >= start):
+            found = ending
+    if found and found not in endings:
+        before = len(word) - len(found) - 1
+        if before < start or word[before] not in 'ая':
+            return ''
+    return found
+
+
+def _cut(word, ending):
+    return word[:len(word) - len(ending)]
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv, r2 = _regions(word)
+
+    ending = _ending(word, rv, PERFECTIVE_GERUND[1], PERFECTIVE_GERUND[0])
+    if ending:
+        word = _cut(word, ending)
+    else:
+        word = _cut(word, _ending(word, rv, REFLEXIVE))
+        ending = _ending(word, rv, ADJECTIVE)
+        if ending:
+            word = _cut(word, ending)
+            word = _cut(word, _ending(word, rv, PARTICIPLE[1], PARTICIPLE[0]))
+        else:
+            ending = _ending(word, rv, VERB[1], VERB[0])
+            if not ending:
+                ending = _ending(word, rv, NOUN)
+            word = _cut(word, ending)
+
+    word = _cut(word, _ending(word, rv, ('и',)))
+    word = _cut(word, _ending(word, r2, DERIVATIONAL))
+
+    ending = _ending(word, rv, SUPERLATIVE)
+    if ending:
+        word = _cut(word, ending)
+    if _ending(word, rv, ('нн',)):
+        word = word[:-1]
+    elif not ending:
+        word = _cut(word, _ending(word, rv, ('ь',)))
+    return word
+
+
+def stems(text):
+    """Основы всех слов текста по порядку."""
+    return [stem(word) for word in WORD_RE.findall(text)]
@@ -0,0 +1,35 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла — SHA-256 его содержимого.
+
+    Одинаковые изображения, загруженные разными постами, лежат одним
+    файлом, а значит, и миниатюры с вариантами у них общие. Файлы, на
+    которые больше не ссылается ни один пост, удаляет команда
+    ``collect_images``.
+    """
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest.hexdigest() + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Обновляем время изменения, чтобы collect_images не удалил
+            # осиротевший файл, пока пост с ним ещё не сохранён.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
@@ -0,0 +1,20 @@
+from django import template
+
+from posts import thumbnails, variants
+
+register = template.Library()
+
+
+@register.filter
+def ready_thumbnail(image):
+    """Миниатюра, если она уже создана; иначе ставит её в фоновую
+    очередь, сама не создавая."""
+    thumbnail = thumbnails.ready_thumbnail(image)
+    if image and thumbnail is None:
+        thumbnails.enqueue(image.name)
+    return thumbnail
+
+
+@register.filter
+def image_sources(post):
+    return variants.sources(post.image, post.image_variants)
@@ -0,0 +1,169 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser('admin', '', 'password')
+        cls.authors = [
+            User.objects.create(username=f'author{i}') for i in range(5)
+        ]
+        for author in cls.authors:
+            post = Post.objects.create(text='Текст', author=author)
+            Comment.objects.create(post=post, author=author, text='Текст')
+            Follow.objects.create(user=cls.admin, author=author)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, **params):
+        return self.client.get(
+            reverse(f'admin:posts_{model}_changelist'), params
+        )
+
+    def create_rows(self):
+        for i in range(5):
+            author = User.objects.create(username=f'extra{i}')
+            post = Post.objects.create(text='Текст', author=author)
+            Comment.objects.create(post=post, author=author, text='Текст')
+            Follow.objects.create(user=author, author=self.authors[0])
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов списка не зависит от числа строк и
+        пользователей: связи выбираются join-ом, фильтры не грузят
+        всех пользователей."""
+        models = ('post', 'comment', 'follow')
+        before = {}
+        for model in models:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.changelist(model).status_code, 200)
+            before[model] = len(queries)
+        self.create_rows()
+        for model in models:
+            with self.subTest(model=model):
+                with self.assertNumQueries(before[model]):
+                    self.changelist(model)
+
+    def test_username_filter(self):
+        response = self.changelist('comment', author='author3')
+        comments = response.context['cl'].result_list
+        self.assertEqual([c.author for c in comments], [self.authors[3]])
+        self.assertContains(response, 'value="author3"')
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=1)
+    def test_estimated_count(self):
+        """Нефильтрованная большая таблица считается по оценке, а
+        отфильтрованная — точно."""
+        Post.objects.filter(author=self.authors[2]).delete()
+        response = self.changelist('post')
+        self.assertEqual(response.context['cl'].result_count, 5)
+        response = self.changelist('post', author='author1')
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+@override_settings(MODERATION_BATCH_SIZE=2)
+class ModerationActionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser('admin', '', 'password')
+        cls.spammer = User.objects.create(username='spammer')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.posts = [
+            Post.objects.create(text=f'Спам {i}', author=self.spammer)
+            for i in range(5)
+        ]
+        for post in self.posts:
+            Comment.objects.create(post=post, author=self.admin, text='Ок')
+            Comment.objects.create(post=post, author=self.spammer,
+                                   text='Спам')
+
+    def act(self, model, action, queryset, **extra):
+        return self.client.post(
+            reverse(f'admin:posts_{model}_changelist'),
+            {
+                'action': action,
+                '_selected_action': [obj.pk for obj in queryset],
+                **extra,
+            },
+            follow=True,
+        )
+
+    def posts_count(self):
+        return UserCounters.objects.get(user=self.spammer).posts_count
+
+    def test_delete_posts_in_batches(self):
+        """Удаление идёт порциями без загрузки объектов и поправляет
+        связанные данные."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.act('post', 'delete_posts', self.posts)
+        statements = [query['sql'] for query in queries]
+        self.assertEqual(len([
+            sql for sql in statements
+            if sql.startswith('DELETE FROM "posts_post"')
+        ]), 3)
+        self.assertFalse([
+            sql for sql in statements
+            if sql.startswith('SELECT "posts_comment"."id", ')
+        ])
+        self.assertContains(response, 'Удалить: 5')
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(self.posts_count(), 0)
+
+    def test_hide_and_show_posts(self):
+        self.act('post', 'hide_posts', self.posts[:3])
+        response = self.client.get(reverse('index'))
+        self.assertEqual(len(response.context['page']), 2)
+        self.assertEqual(self.posts_count(), 2)
+        self.act('post', 'show_posts', self.posts)
+        self.assertEqual(self.posts_count(), 5)
+
+    def test_show_posts_queries_do_not_grow(self):
+        """Возврат постов переиндексирует их одним запросом на порцию,
+        а не по запросу на пост."""
+        self.act('post', 'hide_posts', self.posts[:3])
+        with CaptureQueriesContext(connection) as queries:
+            self.act('post', 'show_posts', self.posts[:1])
+        with self.assertNumQueries(len(queries)):
+            self.act('post', 'show_posts', self.posts[1:3])
+        self.assertEqual(len(search.search('спам')), 5)
+
+    def test_move_to_group(self):
+        self.act('post', 'move_to_group', self.posts[:4],
+                 group=self.group.pk)
+        self.assertEqual(self.group.posts.count(), 4)
+        response = self.client.get(reverse('group', args=['group']))
+        self.assertEqual(len(response.context['page']), 4)
+
+    def test_move_without_group_is_rejected(self):
+        """Перенос без выбранной группы ничего не меняет, убрать посты
+        из группы можно только отдельным действием."""
+        Post.objects.update(group=self.group)
+        response = self.act('post', 'move_to_group', self.posts, group='')
+        self.assertContains(response, 'Выберите группу для переноса')
+        self.assertEqual(self.group.posts.count(), 5)
+        self.act('post', 'ungroup_posts', self.posts[:2])
+        self.assertEqual(self.group.posts.count(), 3)
+
+    def test_hide_comments(self):
+        spam = Comment.objects.filter(author=self.spammer)
+        self.act('comment', 'hide_comments', spam)
+        post = Post.objects.get(pk=self.posts[0].pk)
+        self.assertEqual(post.comment_count, 1)
+        response = self.client.get(
+            reverse('post', args=['spammer', post.pk])
+        )
+        self.assertEqual(
+            [c.text for c in response.context['comment_page']], ['Ок']
+        )
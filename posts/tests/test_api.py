@@ -0,0 +1,117 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from yatube.test_runner import commit_callbacks
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            text='Текст', author=cls.author, group=cls.group
+        )
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Да')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds(self):
+        urls = (
+            reverse('api_index'),
+            reverse('api_group', args=['group']),
+            reverse('api_profile', args=['author']),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(
+                    [post['id'] for post in data['results']], [self.post.pk]
+                )
+                self.assertEqual(data['results'][0]['author'], 'author')
+                self.assertEqual(data['results'][0]['group'], 'group')
+                self.assertIsNone(data['next'])
+
+    def test_post_with_comments(self):
+        data = self.client.get(reverse('api_post', args=[self.post.pk])).json()
+        self.assertEqual(data['comment_count'], 1)
+        self.assertEqual(data['comments'][0]['author'], 'reader')
+        response = self.client.get(reverse('api_post', args=[0]))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('detail', response.json())
+
+    @mock.patch('yatube.settings.COMMENTS_PER_PAGE', 2)
+    def test_post_comments_paginated(self):
+        """Комментарии поста листаются курсором, сначала новые."""
+        for i in range(2):
+            Comment.objects.create(post=self.post, author=self.reader,
+                                   text=f'Ещё {i}')
+        url = reverse('api_post', args=[self.post.pk])
+        data = self.client.get(url).json()
+        self.assertEqual([comment['text'] for comment in data['comments']],
+                         ['Ещё 1', 'Ещё 0'])
+        self.assertIsNone(data['comments_previous'])
+        data = self.client.get(data['comments_next']).json()
+        self.assertEqual([comment['text'] for comment in data['comments']],
+                         ['Да'])
+        self.assertIsNone(data['comments_next'])
+
+    def test_head_allowed(self):
+        response = self.client.head(reverse('api_index'))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(reverse('api_index'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_post_etag_follows_author_and_group(self):
+        """Новое имя автора, комментатора и адрес группы меняют ETag
+        поста."""
+        url = reverse('api_post', args=[self.post.pk])
+        renames = (
+            (Group, self.group.pk, 'slug', 'cats'),
+            (User, self.author.pk, 'username', 'writer'),
+            (User, self.reader.pk, 'username', 'critic'),
+        )
+        for model, pk, field, value in renames:
+            with self.subTest(field=field, value=value):
+                etag = self.client.get(url)['ETag']
+                instance = model.objects.get(pk=pk)
+                setattr(instance, field, value)
+                with commit_callbacks():
+                    instance.save()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(value, response.content.decode())
+
+    def test_follow_requires_login(self):
+        response = self.client.get(reverse('api_follow_index'))
+        self.assertEqual(response.status_code, 401)
+        self.client.force_login(self.reader)
+        data = self.client.get(reverse('api_follow_index')).json()
+        self.assertEqual([post['id'] for post in data['results']],
+                         [self.post.pk])
+
+    def test_not_modified_without_queries(self):
+        """Повторный запрос с ETag получает 304, не обращаясь к базе;
+        новый пост меняет ETag."""
+        url = reverse('api_index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with commit_callbacks():
+            Post.objects.create(text='Новый', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
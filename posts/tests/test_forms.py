@@ -1,13 +1,18 @@
+import os
 import shutil
 import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from posts.forms import PostForm
-from posts.models import Group, Post, User
+from posts.models import Comment, Group, Post, User
 
 
 class PostCreateFormTests(TestCase):
@@ -75,7 +80,7 @@ class PostCreateFormTests(TestCase):
         self.assertTrue(Post.objects.filter(
             text='Текст',
             group=self.group.id,
-            image='posts/small.gif').exists()
+            image__regex=r'^posts/[0-9a-f]{64}\.gif$').exists()
         )
 
     def test_edit_existing_post(self):
@@ -98,3 +103,122 @@ class PostCreateFormTests(TestCase):
             group=self.group.id,
             text='Изменённый текст',
             author=self.user).exists())
+
+
+    def test_edit_keeps_concurrent_comment(self):
+        """Комментарий, добавленный во время правки, не теряется."""
+        clean = PostForm.clean
+
+        def comment_then_clean(form):
+            Comment.objects.create(post=self.post, author=self.user,
+                                   text='Пока правили')
+            return clean(form)
+
+        with mock.patch.object(PostForm, 'clean', comment_then_clean):
+            self.authorized_client.post(
+                reverse('post_edit', args=[self.user.username, self.post.id]),
+                {'group': self.group.id, 'text': 'Изменённый текст'},
+            )
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.text, 'Изменённый текст')
+        self.assertEqual(post.comment_count, post.comments.count())
+
+
+class BoundedUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def upload(self, content, name='photo.jpg'):
+        return self.client.post(reverse('new_post'), {
+            'text': 'Текст',
+            'image': SimpleUploadedFile(name, content, 'image/jpeg'),
+        })
+
+    def jpeg(self, size, **params):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'JPEG', **params)
+        return buffer.getvalue()
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100 * 100)
+    def test_too_many_pixels(self):
+        """Изображение с лишними точками отклоняется по заголовку."""
+        response = self.upload(self.jpeg((200, 100)))
+        self.assertFormError(
+            response, 'form', 'image',
+            'Изображение слишком большое: 200x100, не больше 10000 точек.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_BYTES=1024)
+    def test_too_many_bytes(self):
+        """Файл больше лимита обрывается при приёме."""
+        response = self.upload(self.jpeg((100, 100)) + b'\0' * 2048)
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 1,0\xa0КБ.'
+        )
+
+    def test_handler_only_in_post_views(self):
+        """Обработчик ставится только view поста, и CSRF у них
+        по-прежнему проверяется."""
+        self.assertNotIn('posts.uploads.BoundedImageUploadHandler',
+                         settings.FILE_UPLOAD_HANDLERS)
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(reverse('new_post'), {'text': 'Текст'})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Post.objects.exists())
+
+    def test_not_an_image(self):
+        response = self.upload(b'not an image', name='photo.txt')
+        self.assertFormError(
+            response, 'form', 'image', 'Загрузите правильное изображение.'
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIDE=300)
+    def test_reencoded_without_exif(self):
+        """Принятое изображение уменьшено и сохранено без EXIF."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        self.upload(self.jpeg((600, 400), exif=exif.tobytes()))
+        post = Post.objects.get()
+        with post.image.open() as stored, Image.open(stored) as image:
+            self.assertEqual(image.size, (300, 200))
+            self.assertNotIn('exif', image.info)
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые изображения хранятся одним файлом, а неиспользуемые
+        файлы удаляет collect_images."""
+        content = self.jpeg((100, 100))
+        self.upload(content, name='first.jpg')
+        first = Post.objects.get()
+        storage = first.image.storage
+        path = storage.path(first.image.name)
+        os.utime(path, (0, 0))
+        self.upload(content, name='SECOND.JPG')
+        second = Post.objects.latest('id')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.endswith('.jpg'))
+        self.assertEqual(len(storage.listdir('posts')[1]), 1)
+        # Повторная загрузка защищает файл от collect_images.
+        self.assertGreater(os.path.getmtime(path), 0)
+
+        self.upload(self.jpeg((50, 50)), name='other.jpg')
+        orphan = Post.objects.latest('id').image.name
+        Post.objects.filter(image=orphan).delete()
+        call_command('collect_images', min_age=0, stdout=StringIO())
+        self.assertFalse(storage.exists(orphan))
+        self.assertTrue(storage.exists(first.image.name))
@@ -0,0 +1,169 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from posts import counters, search
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                          UserCounters)
+
+MODELS = ('group', 'post', 'comment', 'follow')
+
+
+class TransferTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(
+            title='Котики', slug='cats', description='Всё о котиках'
+        )
+        cls.post = Post.objects.create(
+            text='Котики играли с клубком', author=cls.author,
+            group=cls.group,
+        )
+        cls.hidden = Post.objects.create(
+            text='Скрытый пост', author=cls.author, is_hidden=True
+        )
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Хорошие котики')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def export(self, fmt):
+        paths = {}
+        for model in MODELS:
+            paths[model] = os.path.join(self.directory, f'{model}.{fmt}')
+            call_command('export_posts', model, output=paths[model])
+        return paths
+
+    def load(self, path, model, **options):
+        out = StringIO()
+        call_command('import_posts', model, path, stdout=out, **options)
+        return out.getvalue()
+
+    def wipe(self):
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        Follow.objects.all().delete()
+        TimelineEntry.objects.all().delete()
+        UserCounters.objects.all().delete()
+        User.objects.exclude(username='reader').delete()
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка в пустую базу восстанавливают данные,
+        ключи постов и всё, что обычно заполняют сигналы."""
+        for fmt in ('jsonl', 'csv'):
+            with self.subTest(format=fmt):
+                posts = list(Post.objects.order_by('pk').values())
+                comments = list(Comment.objects.values())
+                entries = set(TimelineEntry.objects.values_list(
+                    'post', 'user', 'pub_date'
+                ))
+                paths = self.export(fmt)
+                self.wipe()
+                for model in MODELS:
+                    self.load(paths[model], model, create_users=True)
+
+                self.assertEqual(
+                    list(Post.objects.order_by('pk').values(
+                        'pk', 'text', 'pub_date', 'updated', 'is_hidden',
+                        'author__username', 'group__slug', 'comment_count',
+                    )),
+                    [{
+                        'pk': self.post.pk, 'text': self.post.text,
+                        'pub_date': posts[0]['pub_date'],
+                        'updated': posts[0]['updated'],
+                        'is_hidden': False, 'author__username': 'author',
+                        'group__slug': 'cats', 'comment_count': 1,
+                    }, {
+                        'pk': self.hidden.pk, 'text': self.hidden.text,
+                        'pub_date': posts[1]['pub_date'],
+                        'updated': posts[1]['updated'],
+                        'is_hidden': True, 'author__username': 'author',
+                        'group__slug': None, 'comment_count': 0,
+                    }],
+                )
+                self.assertEqual(list(Comment.objects.values()), comments)
+                self.assertEqual(
+                    Group.objects.get().description, 'Всё о котиках'
+                )
+                author = User.objects.get(username='author')
+                self.assertFalse(author.has_usable_password())
+                self.assertTrue(Follow.objects.filter(
+                    user=self.reader, author=author
+                ).exists())
+                # Недостающие строки счётчиков создаются при чтении.
+                self.assertEqual(
+                    (counters.for_user(author).posts_count,
+                     counters.for_user(author).followers_count,
+                     counters.for_user(self.reader).following_count),
+                    (1, 1, 1),
+                )
+                self.assertEqual(set(TimelineEntry.objects.values_list(
+                    'post', 'user', 'pub_date'
+                )), entries)
+                self.assertEqual(list(search.search('котик')), [
+                    Post.objects.get(pk=self.post.pk)
+                ])
+
+    def test_import_again_skips_existing(self):
+        paths = self.export('jsonl')
+        for model in MODELS:
+            self.assertIn('загружено: 0', self.load(paths[model], model))
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comment_count, 1)
+
+    def test_unknown_references_skipped(self):
+        path = os.path.join(self.directory, 'posts.jsonl')
+        rows = [
+            {'id': 100, 'author': 'author', 'text': 'Новый котик',
+             'group': 'cats'},
+            {'id': 101, 'author': 'nobody', 'text': 'Чужой пост'},
+            {'id': 102, 'author': 'author', 'text': 'Пост', 'group': 'dogs'},
+            {'author': 'author', 'text': 'Пост без ключа'},
+        ]
+        with open(path, 'w', encoding='utf-8') as file:
+            file.writelines(json.dumps(row) + '\n' for row in rows)
+        output = self.load(path, 'post', batch_size=2)
+        self.assertIn('Прочитано: 4, загружено: 1, пропущено: 3', output)
+        post = Post.objects.get(pk=100)
+        self.assertEqual((post.author, post.group),
+                         (self.author, self.group))
+        self.assertFalse(User.objects.filter(username='nobody').exists())
+        self.assertIn(post, search.search('котик'))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post
+        ).exists())
+        self.assertIn('загружено: 0', self.load(path, 'post'))
+
+    def test_follows_backfilled_in_bulk(self):
+        """Число запросов загрузки подписок не растёт с числом подписок."""
+        def load_follows(readers):
+            path = os.path.join(self.directory, f'{readers[0]}.jsonl')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.writelines(
+                    json.dumps({'user': reader, 'author': 'author'}) + '\n'
+                    for reader in readers
+                )
+            with CaptureQueriesContext(connection) as queries:
+                self.load(path, 'follow', create_users=True)
+            return len(queries)
+
+        self.assertEqual(load_follows(['first']),
+                         load_follows(['second', 'third', 'fourth']))
+        for reader in ('first', 'fourth'):
+            self.assertTrue(TimelineEntry.objects.filter(
+                user__username=reader, post=self.post
+            ).exists())
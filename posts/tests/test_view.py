@@ -1,9 +1,26 @@
+import base64
+import json
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock, skipUnless
+
 from django import forms
+from django.conf import settings
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from PIL import Image
 
-from posts.models import Comment, Follow, Group, Post, User
+from posts import search, thumbnails, timeline, variants, versions
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+from posts.paginator import CursorPaginator
+from posts.templatetags import post_images
+from yatube.test_runner import commit_callbacks
 
 # from .templates.index import cache
 
@@ -83,6 +100,12 @@ class PostViewTests(TestCase):
                 form_field = response.context['form'].fields[value]
                 self.assertIsInstance(form_field, expected)
 
+    def test_new_post_form_opens_no_transaction(self):
+        """Показ формы не берёт блокировку записи."""
+        with mock.patch('posts.views.transaction.atomic') as atomic:
+            self.authorized_client.get(reverse('new_post'))
+        atomic.assert_not_called()
+
     def test_post_edit_page_show_correct_context(self):
         """Шаблон post_edit сформирован с правильным контекстом."""
         response = self.authorized_client.get(reverse('post_edit', kwargs={
@@ -141,21 +164,46 @@ class PostViewTests(TestCase):
         """Проверяем корректнось кэширования шаблона index."""
         response = self.authorized_client.get(reverse('index'))
         previous_content = response.content
-        Post.objects.create(text='Новый пост', author=self.user, )
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
         response = self.authorized_client.get(reverse('index'))
-        next_content = response.content
-        self.assertEqual(previous_content, next_content,
+        self.assertEqual(previous_content, response.content,
                          'Кэширование не работает')
 
-        cache.clear()
-
+        with commit_callbacks():
+            Post.objects.create(text='Новый пост', author=self.user, )
         response = self.authorized_client.get(reverse('index'))
-        cleared_cache_content = response.content
         self.assertNotEqual(
-            cleared_cache_content,
-            next_content,
-            'Кэширование не работает'
+            previous_content,
+            response.content,
+            'Новая запись не сбрасывает кэш'
         )
+        self.assertContains(response, 'Новый пост')
+
+    def test_cached_pages_reflect_writes(self):
+        """Страницы группы, профиля и поста кэшируются и сбрасываются
+        при записи в их ленту."""
+        urls = [
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.user.username}),
+            reverse('post', kwargs={
+                'username': self.user.username, 'post_id': self.post.id
+            }),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                self.guest_client.get(url)
+                Post.objects.filter(pk=self.post.pk).update(text='Скрыто')
+                response = self.guest_client.get(url)
+                self.assertNotContains(response, 'Скрыто')
+
+                with commit_callbacks():
+                    Comment.objects.create(
+                        post=self.post, author=self.user, text='Обновление',
+                    )
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'Скрыто')
+                Post.objects.filter(pk=self.post.pk).update(text='Текст')
 
     def test_auth_user_can_follow(self):
         """Авторизованный пользователь может подписываться на других
@@ -196,7 +244,7 @@ class PostViewTests(TestCase):
         """Только авторизированный пользователь может комментировать посты."""
         kwargs = {'username': self.user.username, 'post_id': self.post.id}
         response = self.authorized_client.get(reverse('post', kwargs=kwargs))
-        comments_count = response.context['comments'].count()
+        comments_count = len(response.context['comment_page'])
         self.assertEqual(comments_count, 1, 'Комментирование не работает')
         Comment.objects.create(
             post=self.post,
@@ -204,7 +252,7 @@ class PostViewTests(TestCase):
             text='Новый комментарий',
         )
         response = self.authorized_client.get(reverse('post', kwargs=kwargs))
-        comments_count = response.context['comments'].count()
+        comments_count = len(response.context['comment_page'])
         self.assertEqual(comments_count, 2, 'Комментирование не работает')
 
 
@@ -221,10 +269,709 @@ class PaginatorViewsTest(TestCase):
                 author=cls.user,
             )
 
+    def setUp(self):
+        cache.clear()
+
     def test_first_page_containse_ten_records(self):
         response = self.client.get(reverse('index'))
         self.assertEqual(len(response.context.get('page').object_list), 10)
 
     def test_second_page_containse_three_records(self):
-        response = self.client.get(reverse('index') + '?page=2')
+        response = self.client.get(reverse('index'))
+        cursor = response.context.get('page').next_cursor
+        response = self.client.get(reverse('index') + f'?cursor={cursor}')
         self.assertEqual(len(response.context.get('page').object_list), 3)
+
+    def test_previous_page_returns_first_records(self):
+        """Курсор «назад» возвращает ту же первую страницу."""
+        first = self.client.get(reverse('index')).context['page']
+        second = self.client.get(
+            reverse('index') + f'?cursor={first.next_cursor}'
+        ).context['page']
+        self.assertFalse(second.has_next())
+        back = self.client.get(
+            reverse('index') + f'?cursor={second.previous_cursor}'
+        ).context['page']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_shows_first_page(self):
+        """Некорректный курсор не ломает страницу."""
+        response = self.client.get(reverse('index') + '?cursor=broken')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page']), 10)
+
+    def test_cursor_with_nulls_shows_first_page(self):
+        """Курсор с null вместо значений ведёт на первую страницу."""
+        raw_values = (
+            ['n', [None, None]],
+            ['p', ['2020-01-01T00:00:00', None]],
+            ['n', {'pub_date': 1, 'id': 2}],
+        )
+        for raw in raw_values:
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(raw).encode()
+            ).decode()
+            for url in (reverse('index'), reverse('api_index')):
+                with self.subTest(raw=raw, url=url):
+                    response = self.client.get(url, {'cursor': cursor})
+                    self.assertEqual(response.status_code, 200)
+            paginator = CursorPaginator(Post.objects.all(), 10)
+            self.assertEqual(len(paginator.get_page(cursor)), 10)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='writer')
+        cls.group = Group.objects.create(
+            title='Заголовок',
+            slug='feed-slug',
+            description='Описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def add_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                text=f'Пост {i}',
+                author=self.author,
+                group=self.group,
+            )
+            Comment.objects.create(post=post, author=self.user, text='Ок')
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_feed_query_count_does_not_depend_on_page_size(self):
+        """Число запросов ленты не растёт вместе с числом постов."""
+        urls = [
+            reverse('index'),
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse('follow_index'),
+        ]
+        self.add_posts(2)
+        few = {url: self.count_queries(url) for url in urls}
+        self.add_posts(8)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), few[url])
+
+    def test_feeds_without_comment_form(self):
+        """В лентах нет формы комментария и csrf-токена, кэш страниц
+        общий для всех вошедших."""
+        self.add_posts(1)
+        urls = [
+            reverse('index'),
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertNotIn('form', response.context)
+                self.assertNotContains(response, 'csrfmiddlewaretoken')
+        first = self.count_queries(reverse('index'))
+        other = Client()
+        other.force_login(User.objects.create(username='other'))
+        with CaptureQueriesContext(connection) as queries:
+            other.get(reverse('index'))
+        self.assertLess(len(queries), first)
+
+    def test_post_page_has_comment_form_once(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        response = self.authorized_client.get(
+            reverse('post', args=[self.author.username, post.pk])
+        )
+        self.assertContains(response, 'id="comment-form"', count=1)
+        self.assertContains(response, 'csrfmiddlewaretoken', count=1)
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='subscriber')
+        cls.author = User.objects.create(username='author')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def follow_page(self):
+        response = self.authorized_client.get(reverse('follow_index'))
+        return list(response.context['page'])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост попадает в ленту подписчика при публикации."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        self.assertEqual(self.follow_page(), [post])
+
+    def test_follow_backfills_and_unfollow_trims_timeline(self):
+        """Подписка дозаполняет ленту, отписка убирает посты автора."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.authorized_client.get(
+            reverse('profile_follow', kwargs={'username': 'author'})
+        )
+        self.assertEqual(self.follow_page(), [post])
+        self.authorized_client.get(
+            reverse('profile_unfollow', kwargs={'username': 'author'})
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+        self.assertEqual(self.follow_page(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_posts_are_read_on_demand(self):
+        """Посты популярного автора не раскладываются, а читаются при
+        открытии ленты."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(self.follow_page(), [post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_author_no_longer_popular_is_fanned_out(self):
+        """Когда автор перестаёт быть популярным, посты, которые
+        читались при открытии ленты, раскладываются по лентам."""
+        other = User.objects.create(username='other')
+        Follow.objects.create(user=other, author=self.author)
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Пока популярен', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        Follow.objects.filter(user=other).delete()
+        self.assertEqual(self.follow_page(), [post])
+
+
+class ProfileCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        Post.objects.create(text='Текст', author=cls.user)
+
+    def test_profile_pages_do_not_count_rows(self):
+        """Страницы профиля и поста берут счётчики без COUNT-запросов."""
+        post = self.user.posts.get()
+        urls = [
+            reverse('profile', kwargs={'username': self.user.username}),
+            reverse('post', kwargs={
+                'username': self.user.username, 'post_id': post.id
+            }),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = Client().get(url)
+                self.assertEqual(response.context['count'], 1)
+                sql = ' '.join(query['sql'] for query in queries)
+                self.assertNotIn('COUNT(', sql)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'план запроса SQLite')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='reader')
+        cls.author = User.objects.create(username='writer')
+        cls.group = Group.objects.create(title='Группа', slug='plan')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(3):
+            post = Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group,
+            )
+            Comment.objects.create(post=post, author=cls.user, text='Ок')
+        cls.post = post
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        for line in plan.splitlines():
+            self.assertNotIn('TEMP B-TREE', line, plan)
+            if 'SCAN' in line:
+                self.assertIn('INDEX', line, plan)
+
+    def test_feed_queries_use_indexes(self):
+        """Основные запросы лент читают индекс без полной сортировки."""
+        feeds = {
+            'index': CursorPaginator(Post.objects.feed(), 10),
+            'group': CursorPaginator(self.group.posts.feed(), 10),
+            'profile': CursorPaginator(self.author.posts.feed(), 10),
+            'follow_index': CursorPaginator(
+                timeline.follow_feed(self.user).feed(), 10,
+                ordering=timeline.FEED_ORDERING,
+            ),
+        }
+        for name, paginator in feeds.items():
+            seek = paginator.encode_cursor('n', paginator.get_page()[0])
+            for cursor in (None, seek):
+                with self.subTest(view=name, cursor=cursor):
+                    queryset = paginator.page_queryset(cursor)
+                    self.assertUsesIndex(queryset)
+                    if cursor:
+                        self.assertNotIn('SCAN', queryset.explain())
+
+    def test_comment_and_follower_lookups_use_indexes(self):
+        """Комментарии поста и подписчики автора читаются по индексу."""
+        self.assertUsesIndex(
+            self.post.comments.order_by('created')
+        )
+        self.assertUsesIndex(
+            Follow.objects.filter(author=self.author).values('user_id')
+        )
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='cards')
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Старый текст', author=self.user, group=self.group,
+        )
+        self.guest_client = Client()
+
+    def test_card_is_shared_between_feeds(self):
+        """Карточка, отрисованная на главной, берётся из кэша в группе."""
+        self.guest_client.get(reverse('index'))
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        response = self.guest_client.get(
+            reverse('group', kwargs={'slug': self.group.slug})
+        )
+        self.assertContains(response, 'Старый текст')
+
+    def test_edit_and_comment_invalidate_only_the_card(self):
+        """Правка поста и новый комментарий обновляют его карточку."""
+        self.guest_client.get(reverse('index'))
+        self.post.text = 'Новый текст'
+        with commit_callbacks():
+            self.post.save()
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'Новый текст')
+
+        with commit_callbacks():
+            Comment.objects.create(post=self.post, author=self.user,
+                                   text='Ок')
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_only_author_sees_edit_link(self):
+        """Ссылка редактирования не попадает в общий кэш карточки."""
+        author_client = Client()
+        author_client.force_login(self.user)
+        edit_url = reverse('post_edit', kwargs={
+            'username': self.user.username, 'post_id': self.post.id,
+        })
+        self.assertContains(author_client.get(reverse('index')), edit_url)
+        self.assertNotContains(
+            self.guest_client.get(reverse('index')), edit_url
+        )
+
+
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 800), 'red').save(buffer, 'JPEG')
+        self.post = Post.objects.create(
+            text='Текст',
+            author=self.user,
+            image=SimpleUploadedFile('photo.jpg', buffer.getvalue()),
+        )
+
+    def test_render_does_not_open_images(self):
+        """Отрисовка ленты не открывает изображения, а ставит миниатюру
+        в очередь; после её создания лента показывает миниатюру."""
+        with mock.patch('sorl.thumbnail.default.engine.get_image') as opened:
+            with mock.patch('posts.thumbnails.enqueue') as enqueued:
+                response = self.client.get(reverse('index'))
+        opened.assert_not_called()
+        enqueued.assert_called_once_with(self.post.image.name)
+        self.assertContains(response, self.post.image.url)
+
+        self.assertTrue(thumbnails.generate(self.post.image.name))
+        thumbnail = thumbnails.ready_thumbnail(self.post.image)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, thumbnail.url)
+        self.assertFalse(thumbnails.generate(self.post.image.name))
+
+    def test_render_enqueues_thumbnail_once(self):
+        """Отрисовки ставят одну фоновую задачу на изображение, а без
+        фонового пула миниатюру не создают вовсе."""
+        with mock.patch('posts.thumbnails.generate') as generated:
+            with commit_callbacks():
+                self.client.get(reverse('index'))
+        generated.assert_not_called()
+
+        with mock.patch('posts.thumbnails._in_background',
+                        return_value=True):
+            with mock.patch('posts.thumbnails._submit') as submitted:
+                for _ in range(3):
+                    post_images.ready_thumbnail(self.post.image)
+        submitted.assert_called_once_with(self.post.image.name)
+
+    def test_variants_in_srcset(self):
+        """Фоновая обработка сохраняет варианты по ширинам, и карточка
+        отдаёт их в srcset внутри <picture>."""
+        thumbnails.generate(self.post.image.name)
+        self.post.refresh_from_db()
+        storage = default_storage
+        formats = variants.supported_formats()
+        self.assertIn('webp', formats)
+        for width in (480, 960):
+            name = variants.variant_name(self.post.image.name, width, 'webp')
+            self.assertTrue(storage.exists(name))
+            with storage.open(name) as variant:
+                self.assertEqual(Image.open(variant).width, width)
+        # Исходник уже 1440 пикселей не вытягивается.
+        self.assertFalse(storage.exists(
+            variants.variant_name(self.post.image.name, 1440, 'webp')
+        ))
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '.960w.webp 960w')
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        cls.cats = Post.objects.create(
+            text='Сегодня котики играли с клубком', author=cls.user
+        )
+        cls.dogs = Post.objects.create(
+            text='Собака гуляла во дворе', author=cls.user
+        )
+
+    def test_search_uses_stems(self):
+        """Поиск находит пост по другой форме слова."""
+        response = self.client.get(reverse('search'), {'q': 'котик'})
+        self.assertEqual(list(response.context['page']), [self.cats])
+
+    def test_index_follows_edits_and_deletes(self):
+        dogs = Post.objects.get(pk=self.dogs.pk)
+        dogs.text = 'Котик гулял во дворе'
+        dogs.save()
+        Post.objects.get(pk=self.cats.pk).delete()
+        response = self.client.get(reverse('search'), {'q': 'котики'})
+        self.assertEqual(list(response.context['page']), [dogs])
+        response = self.client.get(reverse('search'), {'q': 'собака'})
+        self.assertEqual(len(response.context['page']), 0)
+
+    def test_paginated_by_rank(self):
+        for i in range(settings.POST_PER_PAGE + 1):
+            Post.objects.create(text=f'Котики {i}', author=self.user)
+        response = self.client.get(reverse('search'), {'q': 'котики'})
+        self.assertEqual(response.context['paginator'].count,
+                         settings.POST_PER_PAGE + 2)
+        response = self.client.get(
+            reverse('search'), {'q': 'котики', 'page': 2}
+        )
+        self.assertEqual(len(response.context['page']), 2)
+
+    def test_admin_search(self):
+        admin = User.objects.create_superuser('admin', '', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'клубки'}
+        )
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.cats])
+
+    def test_admin_search_finds_hidden_posts(self):
+        """Модератор находит скрытый пост, чтобы вернуть его."""
+        Post.objects.filter(pk=self.dogs.pk).update(is_hidden=True)
+        search.index(self.dogs.pk)
+        admin = User.objects.create_superuser('admin', '', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'гуляла'}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['cl'].result_list],
+            [self.dogs.pk],
+        )
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            text='Текст', author=cls.author, group=cls.group
+        )
+        cls.urls = (
+            reverse('group', args=['group']),
+            reverse('profile', args=['author']),
+            reverse('post', args=['author', cls.post.pk]),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeat_view_not_modified(self):
+        """Повторный запрос с ETag получает 304 без запросов к базе."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_cache_control(self):
+        """Анонимам — общий ответ с max-age, вошедшим — личный."""
+        url = reverse('post', args=['author', self.post.pk])
+        anonymous = self.client.get(url)
+        self.assertIn('public', anonymous['Cache-Control'])
+        self.assertIn(f'max-age={settings.HTTP_CACHE_MAX_AGE}',
+                      anonymous['Cache-Control'])
+        self.assertIn('Cookie', anonymous['Vary'])
+        self.client.force_login(self.reader)
+        personal = self.client.get(url)
+        self.assertIn('private', personal['Cache-Control'])
+        self.assertNotEqual(personal['ETag'], anonymous['ETag'])
+
+    def test_writes_change_etag(self):
+        url = reverse('post', args=['author', self.post.pk])
+        etag = self.client.get(url)['ETag']
+        with commit_callbacks():
+            Comment.objects.create(post=self.post, author=self.reader,
+                                   text='Комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Комментарий')
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            text='Текст', author=cls.author, group=cls.group
+        )
+        cls.urls = (
+            reverse('index'),
+            reverse('group', args=['group']),
+            reverse('profile', args=['author']),
+            reverse('post', args=['author', cls.post.pk]),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeat_anonymous_view_from_cache(self):
+        """Повторный анонимный запрос не обращается к базе."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(second.content, first.content)
+
+    def test_cursor_is_part_of_key(self):
+        self.client.get(reverse('index'))
+        response = self.client.get(reverse('index') + '?cursor=broken')
+        self.assertIsNotNone(response.context)
+
+    def test_authenticated_bypass_cache(self):
+        self.client.get(reverse('index'))
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('index'))
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'author')
+
+    def test_writes_purge_cached_page(self):
+        """Новый пост и комментарий сразу видны анонимам."""
+        post_url = reverse('post', args=['author', self.post.pk])
+        self.client.get(reverse('index'))
+        self.client.get(post_url)
+        with commit_callbacks():
+            Post.objects.create(text='Новый пост', author=self.author)
+            Comment.objects.create(
+                post=self.post, author=self.author, text='Комментарий'
+            )
+        with override_settings(PAGE_CACHE_STALE=0):
+            self.assertContains(self.client.get(reverse('index')),
+                                'Новый пост')
+            self.assertContains(self.client.get(post_url), 'Комментарий')
+
+    def test_missing_pages_leave_no_versions(self):
+        """Запросы к несуществующим страницам не заводят версий."""
+        scopes = {
+            reverse('group', args=['nope']): versions.group_scope('nope'),
+            reverse('profile', args=['nobody']):
+                versions.author_scope('nobody'),
+            reverse('api_post', args=[0]): versions.post_scope(0),
+            reverse('group', args=['group']): versions.group_scope('group'),
+        }
+        for url, scope in scopes.items():
+            with self.subTest(url=url):
+                found = self.client.get(url).status_code == 200
+                self.assertEqual(
+                    cache.get(versions._key(scope)) is not None, found
+                )
+
+    def test_versions_change_after_commit(self):
+        """Пока запись не зафиксирована, страницы остаются под старой
+        версией: иначе её заняли бы ещё старые строки."""
+        before = versions.token(versions.FEED)
+        with commit_callbacks():
+            Post.objects.create(text='Новый пост', author=self.author)
+            self.assertEqual(versions.token(versions.FEED), before)
+        self.assertNotEqual(versions.token(versions.FEED), before)
+
+    def test_group_and_user_edits_purge_cached_pages(self):
+        """Новое название группы и имя автора сразу видны на всех
+        страницах с ними, в том числе при условном GET."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Котики'
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name, author.last_name = 'Лев', 'Толстой'
+        with commit_callbacks():
+            group.save()
+            author.save()
+        with override_settings(PAGE_CACHE_STALE=0):
+            for url in self.urls:
+                with self.subTest(url=url):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=etags[url]
+                    )
+                    self.assertEqual(response.status_code, 200)
+                    self.assertContains(response, '#Котики')
+            for url in self.urls[2:]:
+                self.assertContains(self.client.get(url), 'Лев Толстой')
+
+    # Замер метрик тоже вызывает cache.add, подменённый в тесте.
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_stale_while_revalidate(self):
+        """Пока страницу перерисовывает другой запрос, отдаётся старая."""
+        url = reverse('group', args=['group'])
+        etag = self.client.get(url)['ETag']
+        self.assertIn(f'stale-while-revalidate={settings.PAGE_CACHE_STALE}',
+                      self.client.get(url)['Cache-Control'])
+        with commit_callbacks():
+            Post.objects.create(
+                text='Новый пост', author=self.author, group=self.group
+            )
+        with mock.patch.object(cache, 'add', return_value=False):
+            stale = self.client.get(url)
+        self.assertNotContains(stale, 'Новый пост')
+        self.assertEqual(stale['ETag'], etag)
+        self.assertContains(self.client.get(url), 'Новый пост')
+
+
+@mock.patch('yatube.settings.COMMENTS_PER_PAGE', 3)
+class CommentThreadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.post = Post.objects.create(text='Текст', author=cls.author)
+        cls.url = reverse('post', args=['author', cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+
+    def add_comments(self, count):
+        start = self.post.comments.count()
+        for i in range(start, start + count):
+            reader = User.objects.create(username=f'reader{i}')
+            Comment.objects.create(
+                post=self.post, author=reader, text=f'Комментарий {i}'
+            )
+
+    def test_post_page_shows_newest_comments(self):
+        self.add_comments(5)
+        response = self.client.get(self.url)
+        texts = [item.text for item in response.context['comment_page']]
+        self.assertEqual(
+            texts, ['Комментарий 4', 'Комментарий 3', 'Комментарий 2']
+        )
+        self.assertContains(response, 'comments-more')
+
+    def test_query_count_does_not_depend_on_comments(self):
+        """Авторы комментариев выбираются вместе с комментариями."""
+        self.add_comments(3)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.url)
+        cache.clear()
+        self.add_comments(3)
+        with self.assertNumQueries(len(few)):
+            self.client.get(self.url)
+
+    def test_older_comments_fragment(self):
+        """Ранние комментарии отдаются фрагментом по курсору."""
+        self.add_comments(5)
+        page = self.client.get(self.url).context['comment_page']
+        response = self.client.get(
+            reverse('post_comments', args=['author', self.post.pk]),
+            {'cursor': page.next_cursor},
+        )
+        self.assertTemplateUsed(response, 'include/comments.html')
+        self.assertEqual(
+            [item.text for item in response.context['comment_page']],
+            ['Комментарий 1', 'Комментарий 0'],
+        )
+        self.assertNotContains(response, 'comments-more')
+        self.assertNotContains(response, '<html')
+
+    def test_fragment_of_hidden_post_not_found(self):
+        Post.objects.filter(pk=self.post.pk).update(is_hidden=True)
+        response = self.client.get(
+            reverse('post_comments', args=['author', self.post.pk])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_hidden_post_rejects_comments(self):
+        Post.objects.filter(pk=self.post.pk).update(is_hidden=True)
+        self.client.force_login(self.post.author)
+        response = self.client.post(
+            reverse('add_comment', args=['author', self.post.pk]),
+            {'text': 'Комментарий к скрытому'},
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Comment.objects.filter(
+            text='Комментарий к скрытому'
+        ).exists())
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comment_count, 0
+        )
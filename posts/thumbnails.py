@@ -0,0 +1,146 @@
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection, transaction
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import variants, versions
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+# Сколько секунд задача на миниатюру считается поставленной.
+PENDING_TIMEOUT = 10 * 60
+
+_executor = None
+
+
+def _thumbnail_options():
+    # Повторяет подстановку настроек из ThumbnailBackend.get_thumbnail,
+    # чтобы имя миниатюры совпало с тем, что создаёт sorl.
+    options = dict(OPTIONS)
+    for key, value in default.backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in default.backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def ready_thumbnail(image):
+    """Готовая миниатюра из хранилища ключей sorl или ``None``.
+    Изображение при этом не открывается и не обрабатывается."""
+    if not image:
+        return None
+    source = ImageFile(image)
+    name = default.backend._get_thumbnail_filename(
+        source, GEOMETRY, _thumbnail_options()
+    )
+    return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def generate(name):
+    """Создаёт миниатюру и адаптивные варианты файла ``name``;
+    возвращает, было ли что-то создано заново."""
+    storage = Post._meta.get_field('image').storage
+    try:
+        found = storage.exists(name)
+    except SuspiciousFileOperation:
+        found = False
+    if not found:
+        logger.warning('Изображение %s не найдено', name)
+        return False
+    image = ImageFile(name, storage)
+    posts = Post.objects.filter(image=name).select_related('author', 'group')
+    changes = {}
+    if not ready_thumbnail(image):
+        get_thumbnail(image, GEOMETRY, **OPTIONS)
+        changes['updated'] = timezone.now()
+    if posts.filter(image_variants='').exists():
+        # Одинаковые загрузки делят файл, а с ним и готовые варианты.
+        manifest = posts.exclude(image_variants='').values_list(
+            'image_variants', flat=True
+        ).first()
+        if manifest is None:
+            manifest = json.dumps(variants.generate(storage, name))
+        changes['image_variants'] = manifest
+        changes['updated'] = timezone.now()
+    if not changes:
+        return False
+    # Карточки, уже отрисованные с исходником, перерисуются с миниатюрой.
+    posts.update(**changes)
+    for post in posts:
+        versions.touch(*versions.post_scopes(post))
+    return True
+
+
+def _generate_in_background(name):
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+    finally:
+        cache.delete(_pending_key(name))
+        connection.close()
+
+
+def _in_background():
+    # Поток пула открывает своё соединение, а базу SQLite в памяти (как
+    # в тестах) другое соединение не видит.
+    in_memory = connection.vendor == 'sqlite' and connection.is_in_memory_db()
+    return settings.THUMBNAIL_ASYNC and not in_memory
+
+
+def _submit(name):
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    transaction.on_commit(lambda: _executor.submit(
+        _generate_in_background, name
+    ))
+
+
+def _pending_key(name):
+    digest = hashlib.md5(f'{name}|{GEOMETRY}'.encode()).hexdigest()
+    return f'thumbnail-pending:{digest}'
+
+
+def schedule(name):
+    """Ставит создание миниатюры в фоновый пул после фиксации
+    транзакции, в которой сохранён пост."""
+    if not _in_background():
+        transaction.on_commit(lambda: generate(name))
+        return
+    cache.set(_pending_key(name), True, PENDING_TIMEOUT)
+    _submit(name)
+
+
+def enqueue(name):
+    """Ставит в фоновый пул миниатюру, которой не нашлось при отрисовке.
+
+    Задача на изображение ставится одна, пока она выполняется (но не
+    дольше PENDING_TIMEOUT), сколько бы страниц его ни показали. Без
+    фонового пула не делает ничего: отрисовка не обрабатывает
+    изображения, миниатюру создаст сохранение поста или команда
+    ``generate_thumbnails``.
+    """
+    if not _in_background():
+        return
+    if cache.add(_pending_key(name), True, PENDING_TIMEOUT):
+        _submit(name)
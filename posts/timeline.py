@@ -0,0 +1,181 @@
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import F, Q
+
+from .models import Follow, Post, TimelineEntry, UserCounters
+
+
+def _bulk_insert(entries):
+    # bulk_create собирает все объекты в список, поэтому длинные
+    # генераторы записей вставляются порциями.
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def is_fanned_out(author_id):
+    """Посты автора раскладываются по лентам, только если подписчиков
+    немного; ленты популярных авторов читаются напрямую."""
+    followers = UserCounters.objects.filter(
+        user_id=author_id
+    ).values_list('followers_count', flat=True).first() or 0
+    return followers < settings.TIMELINE_FANOUT_LIMIT
+
+
+def fan_out(post):
+    if not is_fanned_out(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post=post,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def fan_out_many(posts):
+    """``fan_out`` для пачки постов: подписчики всех авторов читаются
+    одним запросом, записи лент вставляются общим ``bulk_create``."""
+    authors = {post.author_id for post in posts}
+    popular = set(UserCounters.objects.filter(
+        user_id__in=authors,
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('user_id', flat=True))
+    followers = defaultdict(list)
+    follows = Follow.objects.filter(
+        author_id__in=authors - popular
+    ).values_list('author_id', 'user_id')
+    for author_id, user_id in follows.iterator():
+        followers[author_id].append(user_id)
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post=post,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for post in posts
+        for user_id in followers[post.author_id]
+    )
+
+
+def backfill(user, author):
+    if not is_fanned_out(author.pk):
+        return
+    posts = Post.objects.filter(author=author).values_list('id', 'pub_date')
+    _bulk_insert(
+        TimelineEntry(
+            user=user,
+            post_id=post_id,
+            author=author,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts[:settings.TIMELINE_BACKFILL_SIZE]
+    )
+
+
+def backfill_many(follows):
+    """``backfill`` для пачки пар ``(user_id, author_id)``: популярность
+    авторов проверяется одним запросом, посты каждого автора читаются
+    один раз на всех новых подписчиков, записи лент вставляются общим
+    ``bulk_create``."""
+    subscribers = defaultdict(list)
+    for user_id, author_id in follows:
+        subscribers[author_id].append(user_id)
+    popular = set(UserCounters.objects.filter(
+        user_id__in=subscribers,
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('user_id', flat=True))
+
+    def entries():
+        for author_id, users in subscribers.items():
+            if author_id in popular:
+                continue
+            posts = list(Post.objects.filter(
+                author_id=author_id
+            ).values_list('id', 'pub_date')[:settings.TIMELINE_BACKFILL_SIZE])
+            for user_id in users:
+                for post_id, pub_date in posts:
+                    yield TimelineEntry(
+                        user_id=user_id,
+                        post_id=post_id,
+                        author_id=author_id,
+                        pub_date=pub_date,
+                    )
+
+    _bulk_insert(entries())
+
+
+def refill(author_id):
+    """Когда у автора становится меньше TIMELINE_FANOUT_LIMIT
+    подписчиков, его посты перестают читаться при открытии ленты. Посты,
+    опубликованные, пока он был популярен, и ленты тех, кто подписался в
+    это время, в ленты не попадали, поэтому последние посты автора
+    раскладываются по лентам всех оставшихся подписчиков."""
+    followers_count = UserCounters.objects.filter(
+        user_id=author_id
+    ).values_list('followers_count', flat=True).first()
+    if followers_count != settings.TIMELINE_FANOUT_LIMIT - 1:
+        return
+    posts = list(Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date'
+    )[:settings.TIMELINE_BACKFILL_SIZE])
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for user_id in followers.iterator()
+        for post_id, pub_date in posts
+    )
+
+
+def trim(user, author):
+    TimelineEntry.objects.filter(user=user, author=author).delete()
+
+
+def unfanned_authors(user):
+    """Авторы из подписок пользователя, чьи посты не раскладываются
+    по лентам."""
+    return UserCounters.objects.filter(
+        user__following__user=user,
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('user_id', flat=True)
+
+
+FEED_ORDERING = ('-feed_date', '-feed_id')
+
+
+def follow_feed(user):
+    """Лента подписок: готовые записи из ленты пользователя плюс посты
+    популярных авторов, прочитанные напрямую (гибридная схема).
+
+    Ключ сортировки ``FEED_ORDERING`` без популярных авторов берётся из
+    самой ленты, чтобы страница читалась диапазоном по её индексу.
+    """
+    authors = list(unfanned_authors(user))
+    if not authors:
+        return Post.objects.filter(timeline_entries__user=user).annotate(
+            feed_date=F('timeline_entries__pub_date'),
+            feed_id=F('timeline_entries__post_id'),
+        )
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(id__in=entries) | Q(author_id__in=authors)
+    ).annotate(feed_date=F('pub_date'), feed_id=F('id'))
@@ -0,0 +1,320 @@
+"""Выгрузка и загрузка групп, постов, комментариев и подписок.
+
+Записи читаются и пишутся потоком в JSON Lines или CSV, поэтому память
+не зависит от объёма данных. Ссылки на пользователей и группы хранятся
+именами и адресами (username, slug), на посты — их ``id``, который
+сохраняется при загрузке. Поэтому ``id`` у постов и комментариев
+обязателен: по нему находятся уже загруженные записи, а индекс и ленты
+заполняются по ключам вставленных записей.
+
+Загрузка идёт порциями по ``batch_size`` записей: на порцию — один
+запрос на разрешение ссылок, ``bulk_create`` и пересчёт того, что обычно
+делают сигналы (счётчики, поисковый индекс, ленты подписок, версии
+кэша). Уже существующие записи пропускаются,
+поэтому прерванную загрузку можно просто запустить снова.
+
+Порядок загрузки: группы, посты, комментарии, подписки.
+"""
+import csv
+import json
+import logging
+from collections import namedtuple
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import counters, search, timeline, versions
+from .models import Comment, Follow, Group, Post, User
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('jsonl', 'csv')
+
+
+# Как выгружается и загружается одна модель: ``columns`` — поля записи,
+# ``lookups`` — откуда они берутся при выгрузке, ``load(rows,
+# create_users)`` — загрузка порции, возвращает число новых записей.
+Spec = namedtuple('Spec', 'model columns lookups load')
+
+
+def _parse(model, row, name, field=None, default=None):
+    """Значение столбца из строки CSV или JSON в тип поля модели."""
+    value = row.get(name)
+    if value in (None, ''):
+        return default
+    return model._meta.get_field(field or name).to_python(value)
+
+
+def _new(objects, existing):
+    """Объекты, ключей которых ещё нет в базе."""
+    ids = [obj.pk for obj in objects]
+    taken = set(existing.filter(pk__in=ids).values_list('pk', flat=True))
+    return [obj for obj in objects if obj.pk not in taken]
+
+
+def _dump(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+@contextmanager
+def _keep_dates(model):
+    """Даты из файла вместо ``auto_now``/``auto_now_add``."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _users(names, create):
+    """Первичные ключи пользователей по именам; с ``create``
+    недостающие заводятся без пароля."""
+    names = set(names)
+    found = dict(User.objects.filter(
+        username__in=names
+    ).values_list('username', 'pk'))
+    missing = names - found.keys()
+    if create and missing:
+        User.objects.bulk_create(
+            (User(username=name, password=make_password(None))
+             for name in missing),
+            ignore_conflicts=True,
+        )
+        found.update(User.objects.filter(
+            username__in=missing
+        ).values_list('username', 'pk'))
+    return found
+
+
+def _groups(slugs):
+    return dict(Group.objects.filter(
+        slug__in=set(slugs)
+    ).values_list('slug', 'pk'))
+
+
+def _post_scopes(post_ids):
+    scopes = {versions.FEED}
+    posts = Post.objects.filter(pk__in=post_ids).order_by().values_list(
+        'pk', 'author__username', 'group__slug'
+    )
+    for pk, username, slug in posts:
+        scopes.update((versions.post_scope(pk),
+                       versions.author_scope(username)))
+        if slug:
+            scopes.add(versions.group_scope(slug))
+    return scopes
+
+
+def load_groups(rows, create_users):
+    taken = set(_groups(row['slug'] for row in rows))
+    groups = {
+        row['slug']: Group(
+            slug=row['slug'],
+            title=row['title'],
+            description=row.get('description') or '',
+        )
+        for row in rows if row['slug'] not in taken
+    }
+    Group.objects.bulk_create(groups.values(), ignore_conflicts=True)
+    return len(groups)
+
+
+def load_posts(rows, create_users):
+    authors = _users((row['author'] for row in rows), create_users)
+    groups = _groups(row['group'] for row in rows if row.get('group'))
+    now = timezone.now()
+    posts = []
+    for row in rows:
+        pk = _parse(Post, row, 'id')
+        author = authors.get(row['author'])
+        group = groups.get(row['group']) if row.get('group') else None
+        if pk is None or author is None or (row.get('group')
+                                            and group is None):
+            continue
+        pub_date = _parse(Post, row, 'pub_date', default=now)
+        posts.append(Post(
+            id=pk,
+            author_id=author,
+            group_id=group,
+            text=row['text'],
+            pub_date=pub_date,
+            updated=_parse(Post, row, 'updated', default=pub_date),
+            image=row.get('image') or None,
+            is_hidden=_parse(Post, row, 'is_hidden', default=False),
+        ))
+    posts = _new(posts, Post.objects)
+    with _keep_dates(Post):
+        Post.objects.bulk_create(posts, ignore_conflicts=True)
+
+    search.index(*[post.pk for post in posts])
+    timeline.fan_out_many([post for post in posts if not post.is_hidden])
+    counters.refresh_posts({post.author_id for post in posts})
+    scopes = _post_scopes([post.pk for post in posts])
+    transaction.on_commit(lambda: versions.touch(*scopes))
+    return len(posts)
+
+
+def load_comments(rows, create_users):
+    authors = _users((row['author'] for row in rows), create_users)
+    post_ids = set(Post.objects.filter(
+        pk__in={_parse(Comment, row, 'post', 'id') for row in rows}
+    ).values_list('pk', flat=True))
+    now = timezone.now()
+    comments = []
+    for row in rows:
+        pk = _parse(Comment, row, 'id')
+        author = authors.get(row['author'])
+        post = _parse(Comment, row, 'post', 'id')
+        if pk is None or author is None or post not in post_ids:
+            continue
+        comments.append(Comment(
+            id=pk,
+            post_id=post,
+            author_id=author,
+            text=row['text'],
+            created=_parse(Comment, row, 'created', default=now),
+            is_hidden=_parse(Comment, row, 'is_hidden', default=False),
+        ))
+    comments = _new(comments, Comment.objects)
+    with _keep_dates(Comment):
+        Comment.objects.bulk_create(comments, ignore_conflicts=True)
+
+    posts = {comment.post_id for comment in comments}
+    counters.refresh_comments(posts)
+    scopes = _post_scopes(posts)
+    transaction.on_commit(lambda: versions.touch(*scopes))
+    return len(comments)
+
+
+def load_follows(rows, create_users):
+    users = _users(
+        [row['user'] for row in rows] + [row['author'] for row in rows],
+        create_users,
+    )
+    follows = {
+        (users[row['user']], users[row['author']]) for row in rows
+        if row['user'] in users and row['author'] in users
+        and row['user'] != row['author']
+    }
+    follows -= set(Follow.objects.filter(
+        user_id__in={user for user, _ in follows},
+        author_id__in={author for _, author in follows},
+    ).values_list('user_id', 'author_id'))
+    Follow.objects.bulk_create(
+        (Follow(user_id=user, author_id=author) for user, author in follows),
+        ignore_conflicts=True,
+    )
+
+    timeline.backfill_many(follows)
+    touched = {pk for follow in follows for pk in follow}
+    counters.refresh_follows(touched)
+    scopes = [versions.follow_scope(user) for user, _ in follows] + [
+        versions.author_scope(name) for name in users
+    ]
+    transaction.on_commit(lambda: versions.touch(*scopes))
+    return len(follows)
+
+
+SPECS = {
+    'group': Spec(
+        Group,
+        ('slug', 'title', 'description'),
+        ('slug', 'title', 'description'),
+        load_groups,
+    ),
+    'post': Spec(
+        Post,
+        ('id', 'author', 'group', 'text', 'pub_date', 'updated', 'image',
+         'is_hidden'),
+        ('id', 'author__username', 'group__slug', 'text', 'pub_date',
+         'updated', 'image', 'is_hidden'),
+        load_posts,
+    ),
+    'comment': Spec(
+        Comment,
+        ('id', 'post', 'author', 'text', 'created', 'is_hidden'),
+        ('id', 'post_id', 'author__username', 'text', 'created',
+         'is_hidden'),
+        load_comments,
+    ),
+    'follow': Spec(
+        Follow,
+        ('user', 'author'),
+        ('user__username', 'author__username'),
+        load_follows,
+    ),
+}
+
+
+def guess_format(path):
+    """Формат по расширению файла, по умолчанию JSON Lines."""
+    return 'csv' if path and path.lower().endswith('.csv') else 'jsonl'
+
+
+def export_rows(name, batch_size=1000):
+    """Записи модели ``name`` по возрастанию ключа, потоком."""
+    spec = SPECS[name]
+    rows = spec.model.objects.order_by('pk').values_list(*spec.lookups)
+    for values in rows.iterator(chunk_size=batch_size):
+        yield dict(zip(spec.columns, map(_dump, values)))
+
+
+def write(rows, file, fmt, columns):
+    if fmt == 'csv':
+        writer = csv.DictWriter(file, columns)
+        writer.writeheader()
+        writer.writerows(rows)
+        return
+    for row in rows:
+        file.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def read(file, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _reset_sequences(model):
+    # Ключи из файла не сдвигают последовательность PostgreSQL.
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def import_rows(name, rows, batch_size=1000, create_users=False,
+                progress=None):
+    """Загружает записи модели ``name`` порциями, каждую в своей
+    транзакции. Возвращает число прочитанных и новых записей: записи
+    без ``id``, с ненайденными ссылками и уже загруженные пропускаются."""
+    spec = SPECS[name]
+    rows = iter(rows)
+    read_count = loaded = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        with transaction.atomic():
+            loaded += spec.load(batch, create_users)
+        read_count += len(batch)
+        logger.info('%s: прочитано %d', name, read_count)
+        if progress is not None:
+            progress(read_count, loaded)
+    _reset_sequences(spec.model)
+    return read_count, loaded
@@ -0,0 +1,138 @@
+"""Приём изображений постов с ограничением памяти.
+
+Обработчик загрузки смотрит на файл по мере поступления: по первым
+килобайтам определяет формат и размеры, считает байты и отбрасывает
+неподходящий файл, не буферизуя его. Форма затем перекодирует принятое
+изображение без EXIF, уменьшив его ещё при декодировании.
+"""
+from functools import wraps
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageOps
+
+# Заголовки поддерживаемых форматов умещаются в первые килобайты; если
+# формат не распознан и здесь, файл не изображение.
+HEADER_LIMIT = 256 * 2 ** 10
+
+
+class RejectedUpload(UploadedFile):
+    """Отклонённый на лету файл: содержимого нет, только причина."""
+
+    def __init__(self, name, error):
+        super().__init__(BytesIO(), name=name, size=0)
+        self.error = error
+
+
+def check_header(image):
+    """Причина отказа по формату и размерам или ``None``."""
+    if image.format not in settings.POST_IMAGE_FORMATS:
+        return 'Формат изображения не поддерживается.'
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        return (f'Изображение слишком большое: {width}x{height}, '
+                f'не больше {settings.POST_IMAGE_MAX_PIXELS} точек.')
+    return None
+
+
+class BoundedImageUploadHandler(FileUploadHandler):
+    """Первый обработчик загрузки view поста (см. ``bounded_uploads``):
+    пропускает данные дальше, пока файл укладывается в ограничения, и
+    обрывает его при нарушении."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.header = BytesIO()
+        self.identified = False
+        self.error = None
+        if (self.content_length or 0) > settings.POST_IMAGE_MAX_BYTES:
+            self.error = self._too_large()
+
+    def _too_large(self):
+        limit = filesizeformat(settings.POST_IMAGE_MAX_BYTES)
+        return f'Файл больше {limit}.'
+
+    def _identify(self):
+        try:
+            # Image.open читает только заголовок, пиксели не декодируются.
+            with Image.open(BytesIO(self.header.getvalue())) as image:
+                self.error = check_header(image)
+        except Exception:
+            if self.header.tell() >= HEADER_LIMIT:
+                self.error = 'Загрузите правильное изображение.'
+            return
+        self.identified = True
+        self.header = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None
+        if start + len(raw_data) > settings.POST_IMAGE_MAX_BYTES:
+            self.error = self._too_large()
+            return None
+        if not self.identified:
+            self.header.write(raw_data)
+            self._identify()
+            if self.error:
+                return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not self.error and not self.identified:
+            self.error = 'Загрузите правильное изображение.'
+        if self.error:
+            return RejectedUpload(self.file_name, self.error)
+        return None
+
+
+def bounded_uploads(view):
+    """Ставит ``BoundedImageUploadHandler`` первым обработчиком загрузки
+    только для ``view``: отклонённые файлы разбирает лишь PostForm.
+
+    Обработчики меняются до чтения ``request.POST``, а его читает уже
+    CsrfViewMiddleware, поэтому CSRF проверяется внутри, как советует
+    документация Django.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers.insert(0, BoundedImageUploadHandler(request))
+        return protected(request, *args, **kwargs)
+    return wrapper
+
+
+def reencode(data):
+    """Копия изображения без метаданных, не больше POST_IMAGE_MAX_SIDE
+    по большей стороне."""
+    side = settings.POST_IMAGE_MAX_SIDE
+    data.seek(0)
+    with Image.open(data) as image:
+        fmt = image.format
+        # Для JPEG draft уменьшает кадр ещё при декодировании.
+        image.draft('RGB', (side, side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((side, side), Image.LANCZOS)
+        if fmt == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        image.save(buffer, fmt)
+    return SimpleUploadedFile(
+        data.name, buffer.getvalue(), Image.MIME.get(fmt)
+    )
+
+
+def pop_rejected(files):
+    """Копия ``files`` без отклонённых файлов и причины отказа по полям."""
+    files = files.copy()
+    errors = {}
+    for name, upload in list(files.items()):
+        if isinstance(upload, RejectedUpload):
+            errors[name] = upload.error
+            del files[name]
+    return files, errors
@@ -1,14 +1,24 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
+    path("api/v1/posts/", api.index, name="api_index"),
+    path("api/v1/posts/<int:post_id>/", api.post_view, name="api_post"),
+    path("api/v1/group/<slug:slug>/", api.group_posts, name="api_group"),
+    path("api/v1/follow/", api.follow_index, name="api_follow_index"),
+    path(
+        "api/v1/users/<str:username>/",
+        api.profile,
+        name="api_profile"
+    ),
     path('404/', views.page_not_found, name='404'),
     path('500/', views.server_error, name='500'),
     path("", views.index, name="index"),
     path("group/<slug:slug>/", views.group_posts, name="group"),
     path("new/", views.new_post, name="new_post"),
     path("follow/", views.follow_index, name="follow_index"),
+    path("search/", views.search_posts, name="search"),
     path(
         "<str:username>/follow/",
         views.profile_follow,
@@ -21,6 +31,11 @@ urlpatterns = [
     ),
     path("<str:username>/", views.profile, name="profile"),
     path("<str:username>/<int:post_id>/", views.post_view, name="post"),
+    path(
+        "<str:username>/<int:post_id>/comments/",
+        views.post_comments,
+        name="post_comments"
+    ),
     path(
         "<str:username>/<int:post_id>/edit/",
         views.post_edit,
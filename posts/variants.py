@@ -0,0 +1,92 @@
+import json
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+# Пропорции кадра совпадают с миниатюрой 960x339 из карточки поста.
+ASPECT = 339 / 960
+
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+
+
+def supported_formats():
+    """Форматы из IMAGE_VARIANT_FORMATS, которые умеет сохранять
+    установленный Pillow (AVIF есть не во всех сборках)."""
+    Image.init()
+    available = set(Image.SAVE)
+    if not features.check('webp'):
+        available.discard('WEBP')
+    return [
+        fmt for fmt in settings.IMAGE_VARIANT_FORMATS
+        if fmt.upper() in available
+    ]
+
+
+def variant_name(name, width, fmt):
+    stem, _ = os.path.splitext(name)
+    return f'{stem}.{width}w.{fmt}'
+
+
+def generate(storage, name):
+    """Сохраняет рядом с исходником из ``storage`` кадры нужных ширин во
+    всех поддерживаемых форматах и возвращает их манифест.
+
+    Варианты, как и миниатюры sorl, пишутся в хранилище по умолчанию:
+    хранилище изображений постов переименовывает файлы по содержимому.
+    """
+    formats = supported_formats()
+    manifest = {fmt: [] for fmt in formats}
+    with storage.open(name) as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        widths = [
+            width for width in sorted(settings.IMAGE_VARIANT_WIDTHS)
+            if width <= image.width
+        ] or [min(settings.IMAGE_VARIANT_WIDTHS)]
+        for width in widths:
+            frame = ImageOps.fit(
+                image, (width, round(width * ASPECT)), Image.LANCZOS
+            )
+            for fmt in formats:
+                buffer = BytesIO()
+                frame.save(buffer, fmt.upper(),
+                           quality=settings.IMAGE_VARIANT_QUALITY)
+                target = variant_name(name, width, fmt)
+                if default_storage.exists(target):
+                    default_storage.delete(target)
+                default_storage.save(target, ContentFile(buffer.getvalue()))
+                manifest[fmt].append(width)
+    return manifest
+
+
+def sources(image, manifest):
+    """Описания ``<source>`` для ``<picture>``: тип и srcset."""
+    if not image or not manifest:
+        return []
+    manifest = json.loads(manifest)
+    return [
+        {
+            'type': MIME_TYPES[fmt],
+            'srcset': ', '.join(
+                f'{default_storage.url(variant_name(image.name, width, fmt))} '
+                f'{width}w'
+                for width in widths
+            ),
+        }
+        for fmt, widths in manifest.items() if widths
+    ]
+
+
+def delete(name):
+    """Удаляет все варианты изображения ``name``."""
+    for width in settings.IMAGE_VARIANT_WIDTHS:
+        for fmt in MIME_TYPES:
+            default_storage.delete(variant_name(name, width, fmt))
@@ -0,0 +1,100 @@
+"""Версии данных для кэша страниц.
+
+Каждая лента (общая, группа, автор, пост, подписки пользователя) имеет
+версию в кэше — время последней записи, которая её затрагивает. Версия
+входит в ключи закэшированных фрагментов, поэтому запись сразу делает
+старые фрагменты недостижимыми и их можно хранить часами.
+"""
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+FEED = 'feed'
+
+_local = threading.local()
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def _key(scope):
+    # Имена пользователей могут быть не в ASCII, а ключи memcached — нет.
+    digest = hashlib.md5(scope.encode()).hexdigest()
+    return f'version:{digest}'
+
+
+def touch(*scopes):
+    now = time.time()
+    cache.set_many(
+        {_key(scope): now for scope in scopes}, settings.VERSION_TIMEOUT
+    )
+
+
+def get(*scopes, missing=None):
+    """Версии ``scopes`` по порядку. Версии, которой нет в кэше
+    (вытеснена или ещё не заводилась), назначается текущее время, но в
+    кэш она не пишется, а попадает в словарь ``missing`` для ``seed``.
+    Внутри ``pending`` назначенные версии берутся оттуда."""
+    keys = [_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    assigned = getattr(_local, 'pending', {})
+    now = time.time()
+    for key in keys:
+        if key not in found:
+            found[key] = assigned.get(key, now)
+            if missing is not None:
+                missing[key] = found[key]
+    return [found[key] for key in keys]
+
+
+@contextmanager
+def pending(missing):
+    """Пока отрисовывается страница, недостающие версии читаются с теми
+    же значениями, что попали в её ETag и ключ кэша."""
+    previous = getattr(_local, 'pending', {})
+    _local.pending = {**previous, **missing}
+    try:
+        yield
+    finally:
+        _local.pending = previous
+
+
+def seed(missing):
+    """Заводит версии из ``missing``. Вызывается, когда объект страницы
+    нашёлся: запросы к несуществующим группам, авторам и постам ключей
+    не оставляют. Версию, которую уже завёл другой запрос, не меняет."""
+    for key, stamp in missing.items():
+        cache.add(key, stamp, settings.VERSION_TIMEOUT)
+
+
+def token(*scopes):
+    missing = {}
+    stamps = get(*scopes, missing=missing)
+    seed(missing)
+    return '-'.join(repr(version) for version in stamps)
+
+
+def post_scopes(post, group_slug=None):
+    scopes = [FEED, author_scope(post.author.username), post_scope(post.pk)]
+    if post.group_id:
+        scopes.append(group_scope(post.group.slug))
+    if group_slug:
+        scopes.append(group_scope(group_slug))
+    return scopes
@@ -1,99 +1,181 @@
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
 
 from yatube import settings
 
+from . import counters, search, timeline, uploads, versions
 from .forms import CommentForm, PostForm
+from .http import cached_page
 from .models import Follow, Group, Post, User
+from .paginator import CursorPaginator
 
 
+def _index_scopes(request):
+    return [versions.FEED]
+
+
+def _group_scopes(request, slug):
+    return [versions.group_scope(slug)]
+
+
+def _profile_scopes(request, username):
+    return [versions.author_scope(username)]
+
+
+def _post_scopes(request, username, post_id):
+    return [versions.post_scope(post_id), versions.author_scope(username)]
+
+
+def _editor(request):
+    # Ленты различаются только ссылками «Редактировать» у своих постов:
+    # всем, кто ничего не писал, достаётся один фрагмент кэша.
+    user = request.user
+    if user.is_authenticated and user.posts.exists():
+        return user.pk
+    return None
+
+
+@cached_page(_index_scopes)
 def index(request):
 
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    form = CommentForm()
-    context = {"page": page, "form": form, }
+    post_list = Post.objects.feed()
+    paginator = CursorPaginator(post_list, settings.POST_PER_PAGE)
+    page = paginator.get_page(request.GET.get('cursor'))
+    context = {
+        "page": page,
+        "paginator": paginator,
+        "cache_version": versions.token(*_index_scopes(request)),
+        "editor": _editor(request),
+    }
     return render(request, 'index.html', context)
 
 
+@cached_page(_group_scopes)
 def group_posts(request, slug):
 
     group = get_object_or_404(Group, slug=slug)
-    group_list = group.posts.all().order_by('-pub_date')
-    paginator = Paginator(group_list, settings.POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    form = CommentForm()
+    group_list = group.posts.feed()
+    paginator = CursorPaginator(group_list, settings.POST_PER_PAGE)
+    page = paginator.get_page(request.GET.get('cursor'))
     context = {
         "group": group,
         "page": page,
-        "form": form,
+        "paginator": paginator,
+        "cache_version": versions.token(*_group_scopes(request, slug)),
+        "editor": _editor(request),
     }
     return render(request, 'group.html', context)
 
 
 @login_required
+@uploads.bounded_uploads
 def new_post(request):
 
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
-        post = form.save(commit=False)
-        post.author = request.user
-        post.save()
+        # Транзакция только на запись: с BEGIN IMMEDIATE в SQLite даже
+        # показ пустой формы брал бы блокировку записи.
+        with transaction.atomic():
+            post = form.save(commit=False)
+            post.author = request.user
+            post.save()
         return redirect('index')
     return render(request, 'new.html', {"form": form})
 
 
+@cached_page(_profile_scopes)
 def profile(request, username):
 
-    profile = get_object_or_404(User, username=username)
-    profile_post = profile.posts.all()
-    profile_post_count = profile_post.count()
+    profile = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    profile_post = profile.posts.feed()
+    profile_counters = counters.for_user(profile)
     current_user = request.user
-    form = CommentForm()
 
     following = False
     if current_user.is_authenticated and current_user != profile:
         following = current_user.follower.filter(author=profile).exists()
 
-    paginator = Paginator(profile_post, settings.POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    paginator = CursorPaginator(profile_post, settings.POST_PER_PAGE)
+    page = paginator.get_page(request.GET.get('cursor'))
 
     context = {
         "profile": profile,
         "page": page,
+        "paginator": paginator,
         "current_user": current_user,
-        "count": profile_post_count,
-        "form": form,
+        "count": profile_counters.posts_count,
+        "counters": profile_counters,
         "following": following,
+        "cache_version": versions.token(
+            *_profile_scopes(request, username)
+        ),
     }
     return render(request, 'profile.html', context)
 
 
+def visible_comments(post):
+    return post.comments.filter(is_hidden=False).select_related('author')
+
+
+def comment_paginator(comments):
+    # Сначала новые: ранние комментарии подгружаются по курсору.
+    return CursorPaginator(
+        comments, settings.COMMENTS_PER_PAGE, ordering=('-created', '-id')
+    )
+
+
+@cached_page(_post_scopes)
 def post_view(request, username, post_id):
 
     current_user = request.user
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    post = get_object_or_404(
+        Post.objects.feed().select_related('author__counters'),
+        id=post_id,
+        author__username=username,
+    )
     user = post.author
-    users_post_count = user.posts.all().count()
+    user_counters = counters.for_user(user)
     form = CommentForm()
-    comments = post.comments.all()
     context = {
         'profile': user,
         'post': post,
-        'count': users_post_count,
+        'count': user_counters.posts_count,
+        'counters': user_counters,
         'current_user': current_user,
         'form': form,
-        'comments': comments,
+        'comment_page': comment_paginator(
+            visible_comments(post)
+        ).get_page(None),
+        'cache_version': versions.token(
+            *_post_scopes(request, username, post_id)
+        ),
     }
     return render(request, 'post.html', context)
 
 
+@cached_page(_post_scopes)
+def post_comments(request, username, post_id):
+
+    post = get_object_or_404(
+        Post.objects.select_related('author'),
+        id=post_id,
+        author__username=username,
+        is_hidden=False,
+    )
+    paginator = comment_paginator(visible_comments(post))
+    context = {
+        'post': post,
+        'comment_page': paginator.get_page(request.GET.get('cursor')),
+    }
+    return render(request, 'include/comments.html', context)
+
+
 @login_required
+@uploads.bounded_uploads
 def post_edit(request, username, post_id):
 
     post = get_object_or_404(Post, id=post_id, author__username=username)
@@ -107,7 +189,11 @@ def post_edit(request, username, post_id):
                     )
 
     if form.is_valid():
-        form.save()
+        post = form.save(commit=False)
+        # Только поля формы: счётчик комментариев, выросший с момента
+        # чтения поста, не перезаписывается старым значением.
+        with transaction.atomic():
+            post.save(update_fields=[*PostForm.Meta.fields, 'updated'])
         return redirect('post', username, post_id)
     return render(
         request, "new.html", {"form": form, "post": post})
@@ -116,29 +202,47 @@ def post_edit(request, username, post_id):
 @login_required
 def add_comment(request, username, post_id):
 
-    post = get_object_or_404(Post, author__username=username, id=post_id)
+    post = get_object_or_404(
+        Post, author__username=username, id=post_id, is_hidden=False
+    )
     form = CommentForm(request.POST or None)
     if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment = form.save(commit=False)
+            comment.author = request.user
+            comment.post = post
+            comment.save()
     return redirect('post', username, post_id)
 
 
 @login_required
 def follow_index(request):
 
-    post = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post, settings.POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    form = CommentForm()
-    context = {"page": page, "paginator": paginator, "form": form, }
+    post = timeline.follow_feed(request.user).feed()
+    paginator = CursorPaginator(
+        post, settings.POST_PER_PAGE, ordering=timeline.FEED_ORDERING
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    context = {"page": page, "paginator": paginator, }
     return render(request, "follow.html", context)
 
 
+def search_posts(request):
+
+    query = request.GET.get('q', '').strip()
+    results = search.search(query) if query else Post.objects.none()
+    paginator = Paginator(results, settings.POST_PER_PAGE)
+    page = paginator.get_page(request.GET.get('page'))
+    context = {
+        "query": query,
+        "page": page,
+        "paginator": paginator,
+    }
+    return render(request, "search.html", context)
+
+
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
 
     user = request.user
@@ -149,6 +253,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
 
     user = request.user
@@ -1,4 +1,16 @@
+import pytest
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
+    'tests.fixtures.fixture_budget',
 ]
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_cache():
+    """Кэш в памяти вместо общего cache.sqlite3, как в TestRunner."""
+    from yatube.test_runner import isolated_cache
+
+    with isolated_cache():
+        yield
@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+# Бюджет страницы по имени URL: запросов к базе и секунд на один GET
+# тестового клиента. Запросы сессии и пользователя входят в бюджет,
+# управление транзакциями — нет. POST здесь не проверяется: его стоимость
+# зависит от формы (изображение в тестах обрабатывается тут же).
+BUDGETS = {
+    'index': (5, 1.0),
+    'group': (6, 1.0),
+    'profile': (8, 1.0),
+    'post': (6, 1.0),
+    'post_comments': (5, 1.0),
+    'follow_index': (6, 1.0),
+    'search': (6, 1.0),
+    'new_post': (5, 1.0),
+    'post_edit': (6, 1.0),
+    'profile_follow': (16, 1.0),
+    'profile_unfollow': (13, 1.0),
+}
+
+# Бюджет запросов POST без изображения, вместе с BEGIN.
+WRITE_BUDGETS = {
+    'new_post': 9,
+    'add_comment': 8,
+}
+
+TRANSACTION_STATEMENTS = ('BEGIN', 'SAVEPOINT', 'RELEASE SAVEPOINT',
+                          'ROLLBACK', 'COMMIT')
+
+
+def check_budget(response, queries, elapsed):
+    from django.urls import Resolver404
+
+    if response.request['REQUEST_METHOD'] != 'GET':
+        return
+    queries = [query for query in queries
+               if not query['sql'].startswith(TRANSACTION_STATEMENTS)]
+    try:
+        # Адрес разрешается лениво и может не найтись (редирект, 404).
+        url_name = response.resolver_match.url_name
+    except Resolver404:
+        return
+    if url_name not in BUDGETS:
+        return
+    max_queries, max_seconds = BUDGETS[url_name]
+    if len(queries) > max_queries:
+        sql = '\n'.join(query['sql'] for query in queries)
+        pytest.fail(
+            f'Страница `{url_name}` сделала {len(queries)} запросов '
+            f'к базе при бюджете {max_queries}:\n{sql}',
+            pytrace=False,
+        )
+    if elapsed > max_seconds:
+        pytest.fail(
+            f'Страница `{url_name}` отвечала {elapsed:.2f} с '
+            f'при бюджете {max_seconds} с',
+            pytrace=False,
+        )
+
+
+@pytest.fixture(autouse=True)
+def query_budget(monkeypatch):
+    """Каждый запрос тестового клиента проверяется по бюджету ``BUDGETS``."""
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    request = Client.request
+
+    def budgeted_request(self, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = request(self, **kwargs)
+            elapsed = time.perf_counter() - start
+        check_budget(response, queries.captured_queries, elapsed)
+        return response
+
+    monkeypatch.setattr(Client, 'request', budgeted_request)
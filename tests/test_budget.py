@@ -0,0 +1,102 @@
+import pytest
+from django.core.cache import cache
+
+from tests.fixtures.fixture_budget import BUDGETS, WRITE_BUDGETS
+
+
+@pytest.fixture
+def full_feed(user, group):
+    """Две страницы постов разных авторов с группой и комментариями,
+    на всех авторов подписан ``user``. Последний пост прокомментировали
+    все авторы."""
+    from django.contrib.auth import get_user_model
+
+    from posts.models import Comment, Follow, Post
+    from yatube import settings
+
+    User = get_user_model()
+    posts = []
+    for i in range(settings.POST_PER_PAGE * 2):
+        author = User.objects.create(username=f'author{i}')
+        Follow.objects.create(user=user, author=author)
+        post = Post.objects.create(
+            text=f'Пост номер {i}', author=author, group=group
+        )
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+        posts.append(post)
+    for post in posts:
+        Comment.objects.create(
+            post=posts[-1], author=post.author, text='Комментарий'
+        )
+    cache.clear()
+    return posts
+
+
+def page_urls(posts, group):
+    post = posts[-1]
+    author = post.author.username
+    return [
+        '/',
+        f'/group/{group.slug}/',
+        f'/{author}/',
+        f'/{author}/{post.id}/',
+        f'/{author}/{post.id}/comments/',
+        '/follow/',
+        '/search/?q=пост',
+    ]
+
+
+class TestQueryBudget:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pages_within_budget(self, user_client, full_feed, group):
+        for url in page_urls(full_feed, group):
+            response = user_client.get(url)
+            assert response.status_code == 200, (
+                f'Страница `{url}` работает неправильно'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_anonymous_pages_within_budget(self, client, full_feed, group):
+        for url in page_urls(full_feed, group):
+            if url != '/follow/':
+                assert client.get(url).status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_writes_within_budget(self, user, user_client, full_feed,
+                                  django_assert_max_num_queries):
+        from posts.models import Comment, Follow, Post
+
+        post = full_feed[0]
+        author = post.author
+        with django_assert_max_num_queries(WRITE_BUDGETS['new_post']):
+            response = user_client.post('/new/', {'text': 'Новый пост'})
+        assert response.status_code == 302
+        assert Post.objects.filter(author=user, text='Новый пост').exists()
+
+        with django_assert_max_num_queries(WRITE_BUDGETS['add_comment']):
+            response = user_client.post(
+                f'/{author.username}/{post.id}/comment/',
+                {'text': 'Ещё комментарий'},
+            )
+        assert response.status_code == 302
+        assert Comment.objects.filter(
+            post=post, author=user, text='Ещё комментарий'
+        ).exists()
+
+        # Подписка и отписка — GET, их проверяет бюджет из BUDGETS.
+        assert user_client.get(
+            f'/{author.username}/unfollow/'
+        ).status_code == 302
+        assert not Follow.objects.filter(user=user, author=author).exists()
+        assert user_client.get(
+            f'/{author.username}/follow/'
+        ).status_code == 302
+        assert Follow.objects.filter(user=user, author=author).exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_budget_exceeded(self, client, monkeypatch, post):
+        monkeypatch.setitem(BUDGETS, 'index', (0, 1.0))
+        cache.clear()
+        with pytest.raises(pytest.fail.Exception, match='бюджете 0'):
+            client.get('/')
@@ -0,0 +1,189 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в отдельном файле SQLite, общий для всех процессов сервера.
+
+    В отличие от LocMemCache, запись одного воркера сразу видна
+    остальным, а содержимое переживает перезапуск. Файл открывается в
+    режиме WAL: чтения не блокируют запись, ``incr`` атомарен.
+    """
+
+    cull_check_interval = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._location = location
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        # Соединение SQLite нельзя унаследовать через fork воркера.
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(
+                self._location, timeout=30, isolation_level=None,
+                check_same_thread=False,
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            db.execute(
+                'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)'
+            )
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _row(self, key):
+        row = self._db.execute(
+            'SELECT value FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    def _write(self, verb, key, value, timeout):
+        expires = self.get_backend_timeout(timeout)
+        if expires is not None and expires <= time.time():
+            self._db.execute('DELETE FROM cache WHERE key = ?', (key,))
+            return False
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        cursor = self._db.execute(
+            f'{verb} INTO cache (key, value, expires) VALUES (?, ?, ?)',
+            (key, data, expires),
+        )
+        self._maybe_cull()
+        return cursor.rowcount > 0
+
+    def _maybe_cull(self):
+        # COUNT(*) просматривает таблицу, поэтому проверяем размер не на
+        # каждой записи.
+        self._local.writes = getattr(self._local, 'writes', 0) + 1
+        if self._local.writes % self.cull_check_interval:
+            return
+        db = self._db
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries and self._cull_frequency:
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY expires IS NULL, expires '
+                'LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
+
+    def get(self, key, default=None, version=None):
+        value = self._row(self._key(key, version))
+        return default if value is None else value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write('REPLACE', self._key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._db.execute(
+            'DELETE FROM cache WHERE key = ? AND expires <= ?',
+            (key, time.time()),
+        )
+        return self._write('INSERT OR IGNORE', key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        self._db.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        )
+
+    def has_key(self, key, version=None):
+        return self._row(self._key(key, version)) is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            value = self._row(key)
+            if value is None:
+                raise ValueError(f"Key '{key}' not found")
+            value += delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key),
+            )
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return value
+
+    def incr_many(self, deltas, version=None):
+        """Прибавляет ``deltas`` к счётчикам одной транзакцией записи,
+        заводя недостающие без срока, — для счётчиков метрик, которые
+        иначе брали бы блокировку файла на каждый ``incr``."""
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            current = self.get_many(deltas, version)
+            for key, delta in deltas.items():
+                self._write('REPLACE', self._key(key, version),
+                            current.get(key, 0) + delta, None)
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._db.execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) '
+            'AND (expires IS NULL OR expires > ?)',
+            (*keys, time.time()),
+        )
+        return {keys[key]: pickle.loads(value) for key, value in rows}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            for key, value in data.items():
+                self.set(key, value, timeout, version)
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return []
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт в потоке воркера и переиспользуется запросами.
+        pass
@@ -1,8 +1,16 @@
 import datetime as dt
 
+from django.conf import settings
+
 
 def year(request):
     current_year = dt.datetime.now().year
     return {
         'year': current_year
     }
+
+
+def page_cache(request):
+    return {
+        'page_cache_timeout': settings.PAGE_CACHE_TIMEOUT,
+    }
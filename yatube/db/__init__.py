@@ -0,0 +1,2 @@
+"""Бэкенды базы данных проекта: PostgreSQL с пулом соединений на процесс
+и SQLite, настроенный на одновременную работу нескольких воркеров."""
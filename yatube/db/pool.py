@@ -0,0 +1,107 @@
+import os
+import queue
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Не больше ``max_size`` открытых соединений на процесс.
+
+    Свободные соединения переиспользуются, последнее вернувшееся —
+    первым; если все заняты, ``get`` ждёт ``timeout`` секунд. Соединение,
+    пролежавшее свободным дольше ``max_idle`` секунд, закрывается: сервер
+    или балансировщик мог уже разорвать его. ``reset(connection)``
+    готовит вернувшееся соединение к повторному использованию и
+    возвращает ``False``, если оно испорчено.
+    """
+
+    def __init__(self, connect, reset, max_size, timeout=30, max_idle=300):
+        self._connect = connect
+        self._reset = reset
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._timeout = timeout
+        self._max_idle = max_idle
+        self._closed = False
+        self.pid = os.getpid()
+
+    def get(self):
+        if not self._slots.acquire(timeout=self._timeout):
+            raise PoolTimeout(
+                f'нет свободного соединения за {self._timeout} с'
+            )
+        try:
+            while True:
+                try:
+                    connection, returned = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if time.monotonic() - returned < self._max_idle:
+                    return connection
+                _close(connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def put(self, connection):
+        try:
+            if self._closed or not self._reset(connection):
+                _close(connection)
+            else:
+                self._idle.put((connection, time.monotonic()))
+        except Exception:
+            _close(connection)
+        finally:
+            self._slots.release()
+
+    def discard(self, connection):
+        """Закрывает занятое соединение, не возвращая его в пул."""
+        try:
+            _close(connection)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Закрывает свободные соединения; занятые закроются при
+        возврате."""
+        self._closed = True
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            _close(connection)
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def get_pool(key, factory):
+    """Пул этого процесса по ключу. Пулы, созданные до fork воркера,
+    не используются: их соединения принадлежат родителю."""
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None or pool.pid != os.getpid():
+            pool = _pools[key] = factory()
+        return pool
+
+
+def close_all():
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        if pool.pid == os.getpid():
+            pool.close()
@@ -0,0 +1,81 @@
+"""PostgreSQL с пулом соединений на процесс.
+
+Django 2.2 открывает соединение на каждый запрос (или держит одно на
+поток при CONN_MAX_AGE), здесь же закрытие возвращает соединение в
+общий пул процесса, и следующий запрос любого потока берёт уже открытое.
+Размер пула и время ожидания свободного соединения задаются в OPTIONS:
+``pool_size`` и ``pool_timeout``.
+"""
+from django.db.backends.postgresql import base, creation
+from psycopg2 import extensions
+
+from yatube.db import pool
+
+Database = base.Database
+
+
+def _reset(connection):
+    status = connection.get_transaction_status()
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    return not connection.closed
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Базу нельзя удалить, пока пул держит к ней соединения.
+        pool.close_all()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    pool_options = ('pool_size', 'pool_timeout')
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for name in self.pool_options:
+            params.pop(name, None)
+        return params
+
+    def _pool(self, conn_params):
+        options = self.settings_dict['OPTIONS']
+        return pool.get_pool(
+            tuple(sorted(conn_params.items())),
+            lambda: pool.ConnectionPool(
+                lambda: Database.connect(**conn_params),
+                _reset,
+                max_size=options.get('pool_size', 10),
+                timeout=options.get('pool_timeout', 30),
+            ),
+        )
+
+    def get_new_connection(self, conn_params):
+        self.connection_pool = self._pool(conn_params)
+        try:
+            connection = self.connection_pool.get()
+        except pool.PoolTimeout as error:
+            raise Database.OperationalError(str(error)) from error
+
+        # Как в базовом бэкенде, но соединение могло остаться от другого
+        # потока, поэтому уровень изоляции выставляется при каждой выдаче.
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get(
+            'isolation_level', connection.isolation_level
+        )
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                # Django оставит соединение за собой до отката транзакции,
+                # поэтому отдавать его другому потоку нельзя.
+                self.connection_pool.discard(self.connection)
+            else:
+                self.connection_pool.put(self.connection)
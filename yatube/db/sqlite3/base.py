@@ -0,0 +1,23 @@
+"""SQLite для нескольких воркеров.
+
+WAL: чтения не ждут записи и не мешают ей; synchronous=NORMAL в этом
+режиме не теряет целостность и не делает fsync на каждый коммит.
+Транзакции начинаются с BEGIN IMMEDIATE: блокировка записи берётся
+сразу, и конкурирующая транзакция ждёт её ``timeout`` секунд из OPTIONS
+(busy_timeout) вместо мгновенной ошибки «database is locked» при попытке
+перейти от чтения к записи.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    pragmas = ('journal_mode=WAL', 'synchronous=NORMAL')
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for pragma in self.pragmas:
+            connection.execute(f'PRAGMA {pragma}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,197 @@
+"""Замеры запросов по view: число и время SQL, время отрисовки шаблона,
+размер ответа и полное время обработки.
+
+``MetricsMiddleware`` замеряет долю METRICS_SAMPLE_RATE запросов. Замер
+отдаётся клиенту заголовком Server-Timing и складывается в общий кэш
+счётчиками ``incr``, поэтому ``/metrics`` показывает сумму по всем
+воркерам в текстовом формате Prometheus. Время SQL, выполненного из
+шаблона, входит и во время SQL, и во время отрисовки.
+"""
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+from django.urls import URLResolver, get_resolver
+
+_local = threading.local()
+
+OTHER = 'other'
+
+# Поле замера: имя метрики, описание, множитель при хранении. Время
+# хранится в микросекундах: ``incr`` работает только с целыми.
+FIELDS = {
+    'requests': ('yatube_requests_total',
+                 'Запросы, попавшие в выборку.', 1),
+    'queries': ('yatube_db_queries_total', 'Запросы к базе.', 1),
+    'sql': ('yatube_db_seconds_total', 'Время запросов к базе.', 10 ** 6),
+    'render': ('yatube_render_seconds_total',
+               'Время отрисовки шаблонов.', 10 ** 6),
+    'total': ('yatube_request_seconds_total',
+              'Полное время обработки запроса.', 10 ** 6),
+    'bytes': ('yatube_response_bytes_total', 'Размер ответов.', 1),
+}
+
+
+class Sample:
+    """Замер одного запроса; как ``execute_wrapper`` считает SQL."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.render = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql += time.perf_counter() - start
+
+    def server_timing(self, total):
+        return (
+            f'sql;dur={self.sql * 1000:.1f};desc="{self.queries} queries", '
+            f'render;dur={self.render * 1000:.1f}, '
+            f'total;dur={total * 1000:.1f}'
+        )
+
+
+class Template(django_backend.Template):
+
+    def render(self, context=None, request=None):
+        sample = getattr(_local, 'sample', None)
+        if sample is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            sample.render += time.perf_counter() - start
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Шаблонизатор Django, который засекает отрисовку шаблонов view.
+    Вложенные ``{% include %}`` входят во время внешнего шаблона."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+def _key(view, field):
+    return f'metrics:{view}:{field}'
+
+
+def record(view, values):
+    amounts = {
+        _key(view, field): round(value * FIELDS[field][2])
+        for field, value in values.items()
+    }
+    incr_many = getattr(cache, 'incr_many', None)
+    if incr_many is not None:
+        # SQLiteCache: все счётчики замера одной транзакцией записи.
+        incr_many(amounts)
+        return
+    for key, amount in amounts.items():
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            # Первый замер view или счётчик вытеснен из кэша.
+            if not cache.add(key, amount, timeout=None):
+                cache.incr(key, amount)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None or match.url_name is None:
+        return OTHER
+    return match.view_name
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        sample = _local.sample = Sample()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(sample))
+                response = self.get_response(request)
+        finally:
+            _local.sample = None
+        total = time.perf_counter() - start
+        response['Server-Timing'] = sample.server_timing(total)
+        record(_view_name(request), {
+            'requests': 1,
+            'queries': sample.queries,
+            'sql': sample.sql,
+            'render': sample.render,
+            'total': total,
+            'bytes': 0 if response.streaming else len(response.content),
+        })
+        return response
+
+
+def _url_names(patterns, namespace=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = namespace
+            if pattern.namespace:
+                prefix = f'{namespace}{pattern.namespace}:'
+            yield from _url_names(pattern.url_patterns, prefix)
+        elif pattern.name:
+            yield f'{namespace}{pattern.name}'
+
+
+def view_names():
+    """Имена всех view из URLconf: по ним ищутся счётчики в кэше."""
+    names = dict.fromkeys(_url_names(get_resolver().url_patterns))
+    return [*names, OTHER]
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def metrics(request):
+    """Счётчики всех view в текстовом формате Prometheus."""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    views = view_names()
+    found = cache.get_many(
+        [_key(view, field) for view in views for field in FIELDS]
+    )
+    lines = [
+        '# HELP yatube_metrics_sample_rate Доля замеряемых запросов.',
+        '# TYPE yatube_metrics_sample_rate gauge',
+        f'yatube_metrics_sample_rate {settings.METRICS_SAMPLE_RATE}',
+    ]
+    for field, (name, description, scale) in FIELDS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+        for view in views:
+            value = found.get(_key(view, field))
+            if value is not None:
+                value = value if scale == 1 else value / scale
+                lines.append(f'{name}{{view="{_label(view)}"}} {value}')
+    return HttpResponse(
+        '\n'.join(lines) + '\n',
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,12 +52,13 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.metrics.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'yatube.context_processors.year',
+                'yatube.context_processors.page_cache',
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -72,12 +74,42 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# По умолчанию файл SQLite рядом с проектом, в продакшене — PostgreSQL
+# через переменные окружения YATUBE_DB_*. Бэкенды из yatube.db: SQLite в
+# режиме WAL с ожиданием блокировки, PostgreSQL с пулом соединений на
+# процесс. Соединения PostgreSQL и так живут в пуле, поэтому Django
+# возвращает их туда после каждого запроса, а не держит по одному на
+# поток.
+DATABASE_BACKENDS = {
+    'sqlite': ('yatube.db.sqlite3', os.path.join(BASE_DIR, 'db.sqlite3')),
+    'postgresql': ('yatube.db.postgresql', 'yatube'),
+}
+DATABASE_BACKEND = os.environ.get('YATUBE_DB_BACKEND', 'sqlite')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'ENGINE': DATABASE_BACKENDS[DATABASE_BACKEND][0],
+        'NAME': os.environ.get(
+            'YATUBE_DB_NAME', DATABASE_BACKENDS[DATABASE_BACKEND][1]
+        ),
+        'USER': os.environ.get('YATUBE_DB_USER', ''),
+        'PASSWORD': os.environ.get('YATUBE_DB_PASSWORD', ''),
+        'HOST': os.environ.get('YATUBE_DB_HOST', ''),
+        'PORT': os.environ.get('YATUBE_DB_PORT', ''),
+        'CONN_MAX_AGE': int(os.environ.get(
+            'YATUBE_DB_CONN_MAX_AGE', 0 if DATABASE_BACKEND == 'postgresql'
+            else 60
+        )),
     }
 }
+if DATABASE_BACKEND == 'sqlite':
+    # Секунды ожидания чужой блокировки записи (busy_timeout).
+    DATABASES['default']['OPTIONS'] = {'timeout': 20}
+if DATABASE_BACKEND == 'postgresql':
+    DATABASES['default']['OPTIONS'] = {
+        'pool_size': int(os.environ.get('YATUBE_DB_POOL_SIZE', 10)),
+        'pool_timeout': 30,
+    }
 
 
 # Password validation
@@ -133,9 +165,91 @@ EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 POST_PER_PAGE = 10
+# Комментарии на странице поста; более ранние подгружаются по запросу.
+COMMENTS_PER_PAGE = 20
+
+# Кэш общий для всех воркеров: по умолчанию файл SQLite рядом с
+# проектом, в продакшене — Redis или Memcached через переменные окружения
+# YATUBE_CACHE_BACKEND и YATUBE_CACHE_LOCATION.
+CACHE_BACKENDS = {
+    'sqlite': (
+        'yatube.cache_backends.SQLiteCache',
+        os.path.join(BASE_DIR, 'cache.sqlite3'),
+    ),
+    'redis': ('django_redis.cache.RedisCache', 'redis://127.0.0.1:6379/1'),
+    'memcached': (
+        'django.core.cache.backends.memcached.PyLibMCCache',
+        '127.0.0.1:11211',
+    ),
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', ''),
+}
+CACHE_BACKEND = os.environ.get('YATUBE_CACHE_BACKEND', 'sqlite')
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]
+        ),
     }
 }
+if CACHE_BACKEND == 'sqlite':
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': 100000}
+
+# Тесты не трогают кэш запущенного сервера.
+TEST_RUNNER = 'yatube.test_runner.TestRunner'
+
+# Лента подписок: посты авторов, у которых подписчиков меньше
+# TIMELINE_FANOUT_LIMIT, раскладываются по лентам при публикации,
+# остальные подмешиваются при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_BACKFILL_SIZE = 1000
+TIMELINE_BATCH_SIZE = 500
+
+# Фрагменты страниц кэшируются с версией данных в ключе, поэтому живут
+# долго и сбрасываются записью, а не по таймеру.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 4
+
+# Срок хранения версий данных: дольше PAGE_CACHE_TIMEOUT, чтобы
+# закэшированные фрагменты не пережили свою версию.
+VERSION_TIMEOUT = 60 * 60 * 24 * 7
+
+# Миниатюры изображений постов создаются в фоновом пуле потоков сразу
+# после сохранения поста, а не при первой отрисовке страницы.
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+
+# Адаптивные варианты изображений постов для srcset.
+IMAGE_VARIANT_WIDTHS = (480, 960, 1440)
+IMAGE_VARIANT_FORMATS = ('avif', 'webp')
+IMAGE_VARIANT_QUALITY = 80
+
+# Загрузка изображений постов: файл проверяется по мере приёма и
+# отбрасывается, не дойдя до памяти, если нарушает ограничения.
+POST_IMAGE_MAX_BYTES = 10 * 2 ** 20
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_MAX_SIDE = 2560
+POST_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+# Таблицы больше этого админка считает по оценке, а не COUNT(*).
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Размер порции пакетной модерации в админке.
+MODERATION_BATCH_SIZE = 500
+
+# Сколько секунд браузер или прокси может отдавать анонимам страницы
+# лент и поста без обращения к Django.
+HTTP_CACHE_MAX_AGE = 60
+
+# Сколько секунд после записи анонимам ещё отдаётся устаревшая страница,
+# пока один запрос её перерисовывает; 0 — не отдавать.
+PAGE_CACHE_STALE = 30
+
+# Доля запросов, которые замеряет yatube.metrics.MetricsMiddleware
+# (заголовок Server-Timing и счётчики /metrics); 0 — не замерять. Каждый
+# замер — запись в общий кэш, поэтому замеряются не все запросы.
+METRICS_SAMPLE_RATE = float(
+    os.environ.get('YATUBE_METRICS_SAMPLE_RATE', 0.05)
+)
+# Адреса, с которых Prometheus может забирать /metrics.
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
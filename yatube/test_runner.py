@@ -0,0 +1,45 @@
+"""Тесты работают с отдельным кэшем в памяти процесса.
+
+Иначе они очищали бы общий файл cache.sqlite3 запущенного сервера, а
+версии данных и счётчики метрик, которые хранятся неделями, переходили
+бы из одного запуска тестов в другой.
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests',
+    }
+}
+
+
+def isolated_cache():
+    return override_settings(CACHES=TEST_CACHES)
+
+
+@contextmanager
+def commit_callbacks(using=DEFAULT_DB_ALIAS):
+    """Выполняет на выходе колбэки ``transaction.on_commit`` из блока:
+    транзакция TestCase не фиксируется, и сами они не запустятся.
+    В Django 3.2 то же делает ``captureOnCommitCallbacks``."""
+    start = len(connections[using].run_on_commit)
+    yield
+    callbacks = connections[using].run_on_commit[start:]
+    for _, callback in callbacks:
+        callback()
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache = isolated_cache()
+        self._cache.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache.disable()
+        super().teardown_test_environment(**kwargs)
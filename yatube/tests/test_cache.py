@@ -0,0 +1,64 @@
+import shutil
+import tempfile
+from multiprocessing import get_context
+
+from django.test import SimpleTestCase
+
+from yatube.cache_backends import SQLiteCache
+
+
+def write_from_another_process(location):
+    SQLiteCache(location, {}).set('shared', 'из другого процесса')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = f'{self.directory}/cache.sqlite3'
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_basic_operations(self):
+        """Кэш поддерживает операции Django-кэша."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertTrue(self.cache.add('other', 2))
+        self.assertEqual(self.cache.incr('other', 3), 5)
+        self.assertEqual(
+            self.cache.get_many(['key', 'other', 'missing']),
+            {'key': {'value': 1}, 'other': 5},
+        )
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set('expired', 1, timeout=-1)
+        self.assertFalse(self.cache.has_key('expired'))
+
+    def test_incr_many(self):
+        """Счётчики прибавляются вместе, недостающие заводятся."""
+        self.cache.set('old', 2)
+        self.cache.incr_many({'old': 3, 'new': 4})
+        self.assertEqual(self.cache.get_many(['old', 'new']),
+                         {'old': 5, 'new': 4})
+
+    def test_values_are_shared_between_processes(self):
+        """Запись одного процесса видна другому."""
+        process = get_context('spawn').Process(
+            target=write_from_another_process, args=(self.location,)
+        )
+        process.start()
+        process.join()
+        self.assertEqual(self.cache.get('shared'), 'из другого процесса')
+
+    def test_cull_keeps_entries_without_expiry(self):
+        """При переполнении первыми вытесняются записи со сроком."""
+        cache = SQLiteCache(self.location, {
+            'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2},
+        })
+        cache.cull_check_interval = 1
+        cache.set('version', 1, timeout=None)
+        for i in range(20):
+            cache.set(f'fragment-{i}', i)
+        self.assertEqual(cache.get('version'), 1)
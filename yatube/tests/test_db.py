@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from yatube.db import pool
+from yatube.db.sqlite3.base import DatabaseWrapper as SQLiteWrapper
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def make_pool(self, max_size=2, **kwargs):
+        self.opened = []
+
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+
+        kwargs.setdefault('timeout', 0.05)
+        return pool.ConnectionPool(
+            connect, lambda connection: not connection.closed,
+            max_size=max_size, **kwargs
+        )
+
+    def test_reuses_returned_connection(self):
+        connections = self.make_pool()
+        first = connections.get()
+        connections.put(first)
+        self.assertIs(connections.get(), first)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_waits_for_free_connection(self):
+        """Сверх ``max_size`` соединений не открывается: ``get`` ждёт
+        возврата, а по истечении ``timeout`` падает."""
+        connections = self.make_pool(max_size=1, timeout=1)
+        first = connections.get()
+        threading.Timer(0.05, connections.put, [first]).start()
+        self.assertIs(connections.get(), first)
+        connections = self.make_pool(max_size=1)
+        connections.get()
+        with self.assertRaises(pool.PoolTimeout):
+            connections.get()
+
+    def test_broken_and_stale_connections_are_closed(self):
+        connections = self.make_pool(max_size=1)
+        broken = connections.get()
+        broken.closed = True
+        connections.put(broken)
+        fresh = connections.get()
+        self.assertIsNot(fresh, broken)
+
+        connections.discard(fresh)
+        self.assertTrue(fresh.closed)
+        connections = self.make_pool(max_idle=0)
+        stale = connections.get()
+        connections.put(stale)
+        self.assertIsNot(connections.get(), stale)
+        self.assertTrue(stale.closed)
+
+    def test_pool_per_process(self):
+        """После fork воркер не берёт соединения из пула родителя."""
+        self.addCleanup(pool.close_all)
+        parent = pool.get_pool('test', self.make_pool)
+        self.assertIs(pool.get_pool('test', self.make_pool), parent)
+        with mock.patch('os.getpid', return_value=os.getpid() + 1):
+            self.assertIsNot(pool.get_pool('test', self.make_pool), parent)
+
+
+class SQLiteBackendTest(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.wrapper = SQLiteWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(self.directory, 'db.sqlite3'),
+            'OPTIONS': {'timeout': 20},
+        })
+        self.addCleanup(self.wrapper.close)
+
+    def pragma(self, name):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_tuned_for_concurrency(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 20000)
+
+    def test_transactions_take_write_lock(self):
+        """``atomic`` сразу берёт блокировку записи: вторая транзакция
+        ждёт её, а не падает при первой записи после чтения."""
+        other = SQLiteWrapper({**self.wrapper.settings_dict,
+                               'OPTIONS': {'timeout': 0}})
+        self.addCleanup(other.close)
+        self.wrapper._start_transaction_under_autocommit()
+        self.addCleanup(self.wrapper.rollback)
+        with self.assertRaisesMessage(Exception, 'database is locked'):
+            other._start_transaction_under_autocommit()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'пул PostgreSQL')
+class PostgreSQLPoolTest(TransactionTestCase):
+    def test_connection_returns_to_pool(self):
+        connection.ensure_connection()
+        raw = connection.connection
+        connection.close()
+        self.assertFalse(raw.closed)
+        connection.ensure_connection()
+        self.assertIs(connection.connection, raw)
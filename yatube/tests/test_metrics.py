@@ -0,0 +1,89 @@
+import re
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from yatube import metrics
+from yatube.cache_backends import SQLiteCache
+
+
+@override_settings(METRICS_SAMPLE_RATE=1)
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='author')
+        Post.objects.create(text='Текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing(self):
+        """Заголовок Server-Timing содержит число запросов и отрисовку."""
+        url = reverse('profile', args=['author'])
+        header = self.client.get(url)['Server-Timing']
+        queries = int(re.search(r'desc="(\d+) queries"', header)[1])
+        self.assertGreater(queries, 0)
+        self.assertRegex(header, r'render;dur=[\d.]+, total;dur=[\d.]+')
+        cache.clear()
+        with self.assertNumQueries(queries):
+            self.client.get(url)
+
+    def test_metrics_are_aggregated_by_view(self):
+        """Счётчики /metrics суммируют замеры по view."""
+        self.client.get(reverse('index'))
+        response = self.client.get(reverse('index'))
+        self.client.get('/missing/page/')
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('yatube_requests_total{view="index"} 2', text)
+        self.assertIn(
+            f'yatube_response_bytes_total{{view="index"}} '
+            f'{2 * len(response.content)}',
+            text,
+        )
+        self.assertIn('yatube_requests_total{view="other"} 1', text)
+        self.assertRegex(
+            text, r'yatube_render_seconds_total\{view="index"\} [\d.e-]+'
+        )
+        self.assertIn('# TYPE yatube_db_queries_total counter', text)
+
+    def test_record_in_one_write_with_sqlite_cache(self):
+        """С SQLiteCache замер записывается одной транзакцией, а не
+        отдельным ``incr`` на счётчик."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        shared = SQLiteCache(f'{directory}/cache.sqlite3', {})
+        with mock.patch.object(metrics, 'cache', shared):
+            with mock.patch.object(shared, 'incr') as incr:
+                metrics.record('index', {'requests': 1, 'queries': 3})
+                metrics.record('index', {'requests': 1, 'queries': 2})
+        incr.assert_not_called()
+        self.assertEqual(
+            shared.get_many(['metrics:index:requests',
+                             'metrics:index:queries']),
+            {'metrics:index:requests': 2, 'metrics:index:queries': 5},
+        )
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_sample_rate(self):
+        response = self.client.get(reverse('index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertNotIn('view="index"', text)
+
+    def test_metrics_only_for_allowed_ips(self):
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='10.0.0.1'
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_view_names(self):
+        names = metrics.view_names()
+        self.assertIn('post', names)
+        self.assertIn('about:author', names)
+        self.assertEqual(names[-1], metrics.OTHER)
@@ -4,6 +4,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from yatube import metrics
+
 handler404 = "posts.views.page_not_found"  # noqa
 handler500 = "posts.views.server_error"  # noqa
 
@@ -18,6 +20,9 @@ urlpatterns = [
     #  раздел администратора
     path("admin/", admin.site.urls),
 
+    #  счётчики запросов для Prometheus
+    path("metrics/", metrics.metrics, name="metrics"),
+
     #  обработчик для главной страницы ищем в urls.py приложения posts
     path("", include("posts.urls")),
 